@@ -6,7 +6,8 @@ import time
 import matplotlib.pyplot as plt
 import numpy as np
 from env.gridworld import GridWorld
-from planners import bfs_grid, dijkstra_grid, astar_grid
+from env.multi_gridworld import MultiRobotGridWorld
+from planners import bfs_grid, dijkstra_grid, astar_grid, simulate_fleet
 from mdp.mdp_model import SimpleMDPModel
 from rl_agents.value_iteration import ValueIterationAgent
 from rl_agents.q_learning import QLearningAgent
@@ -46,5 +47,26 @@ def run_planner_test(grid_size=10, trials=20, seed=42):
     plt.tight_layout()
     plt.show()
 
+def run_fleet_test(grid_size=20, robot_counts=(1,2,4,8,16), seed=42, num_goal_cells=20, window=8):
+    # planning time per replan and fleet throughput vs number of robots
+    plan_ms, throughput = [], []
+    for n in robot_counts:
+        mgw = MultiRobotGridWorld(size=grid_size, num_goal_cells=num_goal_cells, items_per_goal=3,
+                                  obstacle_prob=0.12, seed=seed, num_robots=n)
+        stats = simulate_fleet(mgw, carry_capacity=3, window=window)
+        plan_ms.append(1000 * stats['planning_time_per_replan'])
+        throughput.append(stats['throughput'])
+        print(f"{n} robots: {stats['delivered']} items in {stats['steps']} steps, "
+              f"throughput {stats['throughput']:.3f} items/step, plan {plan_ms[-1]:.2f} ms/replan, "
+              f"blocked moves {stats['blocked_moves']}")
+    fig, axes = plt.subplots(1,2, figsize=(10,4))
+    axes[0].plot(robot_counts, plan_ms, marker='o')
+    axes[0].set_title('Planning Time per Replan (ms)')
+    axes[1].plot(robot_counts, throughput, marker='o')
+    axes[1].set_title('Fleet Throughput (items/step)')
+    plt.tight_layout()
+    plt.show()
+
 if __name__ == "__main__":
     run_planner_test()
+    run_fleet_test()
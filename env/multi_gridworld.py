@@ -0,0 +1,39 @@
+# env/multi_gridworld.py
+"""
+GridWorld with several robots sharing one floor:
+- docks: one per robot; the corners first (gw.start is robot 0's dock), then free
+  non-goal cells of start's connected component spread by farthest-point sampling
+- per-robot position and carried items; goal cells and their items are shared
+"""
+import numpy as np
+from env.gridworld import GridWorld
+from planners import bfs_distances
+
+class MultiRobotGridWorld(GridWorld):
+    def __init__(self, size=10, num_goal_cells=10, items_per_goal=5, obstacle_prob=0.12, seed=None, num_robots=2):
+        self.num_robots = num_robots
+        super().__init__(size, num_goal_cells, items_per_goal, obstacle_prob, seed)
+
+    def reset(self, chosen_start=None):
+        super().reset(chosen_start)
+        dist = bfs_distances(self.grid, self.start)
+        docks = [self.start] + [c for c in self.corners()
+                              if c != self.start and dist[c] >= 0 and c not in self.goal_cells]
+        # further docks: farthest-point sampling so parked robots do not wall each other in
+        nearest = np.min([bfs_distances(self.grid, d) for d in docks], axis=0)
+        nearest[dist < 0] = -1
+        for g in self.goal_cells:
+            nearest[g] = -1
+        while len(docks) < self.num_robots and nearest.max() > 0:
+            d = tuple(int(v) for v in np.unravel_index(np.argmax(nearest), nearest.shape))
+            docks.append(d)
+            nearest = np.where(nearest > 0, np.minimum(nearest, bfs_distances(self.grid, d)), nearest)
+        if len(docks) < self.num_robots:
+            raise ValueError(f"not enough free cells for {self.num_robots} robot docks")
+        self.docks = docks[:self.num_robots]
+        self.robot_positions = list(self.docks)
+        self.robot_carried = [0] * self.num_robots
+        return self
+
+    def occupied(self):
+        return set(self.robot_positions)
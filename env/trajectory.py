@@ -0,0 +1,147 @@
+# env/trajectory.py
+"""
+Compact binary trajectory recording and streaming replay.
+File layout (little endian, append-only):
+- header: magic b'RTRJ', version, start (r,c), goal count, goal positions, initial items per goal
+- chunks: [u32 payload bytes][u32 records][zlib-compressed fixed-width records]
+- record (14 bytes): r, c, carried (u16), goal index changed (i16, -1 none), delta (i16), reward (f32)
+Record 0 is the start state (reward 0); record i>0 holds the state reached by
+transition i and its reward. Memory use is one chunk for writing and reading.
+"""
+import os
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b'RTRJ'
+VERSION = 1
+RECORD = np.dtype([('r', '<u2'), ('c', '<u2'), ('carried', '<u2'),
+                   ('goal', '<i2'), ('delta', '<i2'), ('reward', '<f4')])
+_CHUNK_HEADER = struct.Struct('<II')
+
+class TrajectoryRecorder:
+    def __init__(self, path, goal_positions, start, initial_goals, chunk_size=4096):
+        self.path = path
+        self.goal_positions = [tuple(g) for g in goal_positions]
+        self.chunk_size = chunk_size
+        self._buf = np.zeros(chunk_size, dtype=RECORD)
+        self._n = 0
+        self._goals = tuple(initial_goals)
+        self.count = 0
+        self._f = open(path, 'wb')
+        header = [MAGIC, struct.pack('<BHHH', VERSION, start[0], start[1], len(self.goal_positions))]
+        for (r, c), n in zip(self.goal_positions, self._goals):
+            header.append(struct.pack('<HHH', r, c, n))
+        self._f.write(b''.join(header))
+
+    @classmethod
+    def for_mdp(cls, path, mdp, chunk_size=4096):
+        return cls(path, mdp.goal_positions, mdp.start, mdp.goal_initial, chunk_size=chunk_size)
+
+    def record(self, state, reward=0.0):
+        """Append one (pos, carried, goals) state and the reward of the transition into it."""
+        (r, c), carried, goals = state
+        goal, delta = -1, 0
+        if goals != self._goals:
+            changed = [k for k, (a, b) in enumerate(zip(self._goals, goals)) if a != b]
+            if len(changed) > 1:
+                raise ValueError("a step may change at most one goal count")
+            goal = changed[0]
+            delta = goals[goal] - self._goals[goal]
+            self._goals = tuple(goals)
+        self._buf[self._n] = (r, c, carried, goal, delta, reward)
+        self._n += 1
+        self.count += 1
+        if self._n == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._n:
+            payload = zlib.compress(self._buf[:self._n].tobytes())
+            self._f.write(_CHUNK_HEADER.pack(len(payload), self._n))
+            self._f.write(payload)
+            self._n = 0
+        self._f.flush()
+
+    def close(self):
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(4) != MAGIC:
+                raise ValueError(f"{path} is not a trajectory file")
+            version, sr, sc, num_goals = struct.unpack('<BHHH', f.read(7))
+            if version != VERSION:
+                raise ValueError(f"unsupported trajectory version {version}")
+            self.start = (sr, sc)
+            self.goal_positions = []
+            initial = []
+            for _ in range(num_goals):
+                r, c, n = struct.unpack('<HHH', f.read(6))
+                self.goal_positions.append((r, c))
+                initial.append(n)
+            self.initial_goals = tuple(initial)
+            self._data_offset = f.tell()
+
+    def chunks(self):
+        """Yield the records chunk by chunk as NumPy structured arrays."""
+        with open(self.path, 'rb') as f:
+            f.seek(self._data_offset)
+            while True:
+                head = f.read(_CHUNK_HEADER.size)
+                if len(head) < _CHUNK_HEADER.size:
+                    return
+                size, n = _CHUNK_HEADER.unpack(head)
+                yield np.frombuffer(zlib.decompress(f.read(size)), dtype=RECORD, count=n)
+
+    def __len__(self):
+        # sum of chunk record counts without decompressing
+        total = 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._data_offset)
+            while True:
+                head = f.read(_CHUNK_HEADER.size)
+                if len(head) < _CHUNK_HEADER.size:
+                    return total
+                size, n = _CHUNK_HEADER.unpack(head)
+                total += n
+                f.seek(size, os.SEEK_CUR)
+
+    def steps(self):
+        """Yield (state, reward) with state = (pos, carried, goals) as in SimpleMDPModel."""
+        goals = list(self.initial_goals)
+        for chunk in self.chunks():
+            for r, c, carried, goal, delta, reward in chunk.tolist():
+                if goal >= 0:
+                    goals[goal] += delta
+                yield ((r, c), carried, tuple(goals)), reward
+
+    def positions(self):
+        for state, _ in self.steps():
+            yield state[0]
+
+    def rewards(self):
+        # rewards aligned with transitions (skips the start record)
+        it = self.steps()
+        next(it, None)
+        for _, reward in it:
+            yield reward
+
+    def goal_history(self):
+        for state, _ in self.steps():
+            yield state[2]
+
+    def replay_kwargs(self):
+        """Lazy keyword arguments for visualization.pygame_viz.animate_path."""
+        return dict(path=self.positions(), rewards=self.rewards(),
+                    goal_history=self.goal_history(), goal_positions=self.goal_positions)
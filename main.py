@@ -3,14 +3,26 @@
 Main runner:
 - Builds gridworld (from config.yaml)
 - Demonstrates planners for one trip: plan route from start to one goal and back
-- Optionally visualizes with pygame_viz
+- Optionally visualizes with pygame_viz (rollout streamed to / replayed from a trajectory file)
 - Runs simple RL agent (Value Iteration) demo to compute policy (for small grids)
+- Estimates the state space first and falls back to learning / refuses when VI cannot finish
+- Optionally (multi_start) solves all corner starts together and keeps the best dock
 """
+import os
+import tempfile
 import yaml
 from env.gridworld import GridWorld
+from env.trajectory import TrajectoryRecorder, TrajectoryReader
 from visualization.pygame_viz import animate_path
 from mdp.mdp_model import SimpleMDPModel
+from mdp.estimator import estimate, measure_step_cost, select_solver
+from planners.routing import plan_collection_routes, plan_routes_multi_start, plan_actions, evaluate_plan
+from planners.goal_dp import GoalDP, solve_goal_dp
 from rl_agents.value_iteration import ValueIterationAgent
+from rl_agents.chunked_value_iteration import ChunkedValueIterationAgent
+from rl_agents.q_learning import QLearningAgent
+from rl_agents.linear_q import LinearQAgent
+from rl_agents.telemetry import TrainingTelemetry, EarlyStopping
 from utils import set_seed
 
 def load_config(path="C:\\Users\\ADMIN\\OneDrive\\Documents\\GitHub\\robot_path\\config\\config.yaml"):
@@ -32,60 +44,150 @@ def run_rl_demo(cfg):
     print("Start:", gw.start)
     print("Goals:", list(gw.goal_cells.items())[:6], " total items:", gw.goals_remaining())
 
-    # Create MDP model and run Value Iteration
+    # Create MDP model and pick a solver that can actually finish
     mdp = SimpleMDPModel(gw, carry_capacity=cfg.get("carry_capacity",3))
-    vi = ValueIterationAgent(mdp, 
-                           gamma=cfg.get("gamma", 0.99),
-                           theta=cfg.get("theta", 1e-3),
-                           max_iters=cfg.get("max_iters", 1000))
+    solver = cfg.get("solver", "auto")
+    episodes = cfg.get("episodes", 2000)
+    multi_start = cfg.get("multi_start", False)
+    # gw.start is always a candidate (never a goal cell, reaches every goal), so starts is never empty
+    starts = [gw.start] + [c for c in gw.corners()[:cfg.get("num_starts", 4)]
+                           if c != gw.start and c not in gw.goal_cells]
+    est = estimate(gw, carry_capacity=mdp.capacity, num_actions=len(mdp.actions),
+                   step_seconds=measure_step_cost(mdp), episodes=episodes,
+                   num_starts=len(starts) if multi_start else 1, vi_mode=cfg.get("vi_mode", "sync"))
+    if solver == "auto":
+        memory_budget = cfg.get("memory_budget_mb")
+        solver, msg = select_solver(est,
+                                    memory_budget=memory_budget * 1024**2 if memory_budget else None,
+                                    time_budget=cfg.get("time_budget_s", 3600),
+                                    episodes=episodes)
+        print("Solver selection:", msg)
+        if solver is None:
+            print("Refusing to run: configuration is intractable. Reduce num_goal_cells, items_per_goal or grid_size.")
+            return
+    if multi_start and solver not in ("goal_dp", "route_optimizer"):
+        print(f"multi_start needs goal_dp or route_optimizer; {solver} uses start {gw.start} only")
+        multi_start = False
+    if solver in ("goal_dp", "route_optimizer"):
+        agent = None  # plans trips directly instead of computing a policy
+    elif solver == "q_learning":
+        patience = cfg.get("early_stop_patience")
+        agent = QLearningAgent(mdp, gamma=cfg.get("gamma", 0.99), episodes=episodes,
+                               telemetry=TrainingTelemetry(cfg.get("telemetry_file")) if cfg.get("telemetry_file") else None,
+                               early_stopping=EarlyStopping(patience, eval_every=cfg.get("eval_every", 10)) if patience else None)
+    elif solver == "linear_q":
+        agent = LinearQAgent(mdp, gamma=cfg.get("gamma", 0.99), episodes=episodes)
+    elif solver == "chunked_value_iteration":
+        agent = ChunkedValueIterationAgent(mdp,
+                                           gamma=cfg.get("gamma", 0.99),
+                                           theta=cfg.get("theta", 1e-3),
+                                           max_iters=cfg.get("max_iters", 1000),
+                                           chunk_size=cfg.get("chunk_size", 1 << 16),
+                                           path=cfg.get("value_file"))
+    else:
+        agent = ValueIterationAgent(mdp, 
+                               gamma=cfg.get("gamma", 0.99),
+                               theta=cfg.get("theta", 1e-3),
+                               max_iters=cfg.get("max_iters", 1000),
+                               mode=cfg.get("vi_mode", "sync"))
 
     # Initial state: (position, items carried, goal states)
     goals_state = tuple([gw.items_per_goal]*len(mdp.goal_positions))
     start_state = (gw.start, 0, goals_state)
     
-    # Run value iteration
-    print("Running Value Iteration...")
-    pi, V = vi.run(start_state)
-    print(f"Value iteration complete. Policy size: {len(pi)}")
+    try:
+        # Run the selected solver
+        print(f"Running {solver}...")
+        plan = None
+        if solver == "goal_dp" and multi_start:
+            # all starts in one batched solve
+            dp = GoalDP(gw, carry_capacity=mdp.capacity, gamma=cfg.get("gamma", 0.99), starts=starts).solve()
+            for st, v in zip(starts, dp.values()):
+                print(f"  start {st}: estimated return {v:.2f}")
+            plan = dp.plan()
+            print(f"Estimated return: {plan['value']:.2f}")
+        elif solver == "goal_dp":
+            plan = solve_goal_dp(gw, carry_capacity=mdp.capacity, gamma=cfg.get("gamma", 0.99))
+            print(f"Estimated return: {plan['value']:.2f}")
+        elif agent is None and multi_start:
+            plans = plan_routes_multi_start(gw, starts, carry_capacity=mdp.capacity,
+                                            time_budget=cfg.get("route_time_budget", 2.0))
+            for p in plans:
+                print(f"  start {p['start']}: {p['cost']} steps")
+            plan = plans[0]
+        elif agent is None:
+            plan = plan_collection_routes(gw, carry_capacity=mdp.capacity,
+                                          time_budget=cfg.get("route_time_budget", 2.0))
+        if plan is not None and plan['start'] != gw.start:
+            # keep the best dock: the rollout and replay use the plan's start
+            print("Best start:", plan['start'])
+            gw.start = gw.robot_pos = plan['start']
+            mdp = mdp.with_start(gw.start)
+            start_state = (gw.start, 0, goals_state)
+        if plan is not None:
+            # the plan is replayed in the model, so check it there
+            model_return, end_state = evaluate_plan(mdp, plan, cfg.get("gamma", 0.99))
+            print(f"{solver} complete. {len(plan['trips'])} trips, {plan['cost']} steps, "
+                  f"model return {model_return:.2f}")
+            if not mdp.is_terminal(end_state):
+                print(f"Warning: the plan ends in {end_state}, which is not terminal in the model")
+        else:
+            pi, V = agent.run(start_state)
+            # function-approximation policies are computed on demand and have no size
+            size = len(pi) if hasattr(pi, "__len__") else "n/a"
+            print(f"{solver} complete. Policy size: {size}")
+            if getattr(agent, "early_stopping", None) is not None and agent.episodes_run < episodes:
+                print(f"Early stop after {agent.episodes_run} of {episodes} episodes "
+                      f"(greedy return {agent.early_stopping.best:.1f})")
 
-    # Generate path using policy
-    if cfg.get("visualize", True):
-        current_state = start_state
-        path = [current_state[0]]
-        state_history = [current_state]
-        rewards = []  # Track rewards
-        steps = 0
-        max_steps = cfg.get("max_steps", 500)
+        # Generate path using policy
+        if cfg.get("visualize", True):
+            current_state = start_state
+            steps = 0
+            max_steps = cfg.get("max_steps", 500)
         
-        # Create a copy of gridworld for simulation
-        sim_gw = gw.copy()
+            # Create a copy of gridworld for simulation
+            sim_gw = gw.copy()
         
-        while steps < max_steps:
-            if mdp.is_terminal(current_state):
-                print("All items collected and returned to start.")
-                break
+            # Stream the rollout to a compact binary trajectory file instead of in-memory lists
+            traj_file = cfg.get("trajectory_file")
+            if not traj_file:
+                fd, traj_file = tempfile.mkstemp(suffix=".rtrj")
+                os.close(fd)
+            # a plan is replayed move by move through the model, so the file holds model states
+            moves = plan_actions(plan) if plan is not None else None
+            with TrajectoryRecorder.for_mdp(traj_file, mdp) as recorder:
+                recorder.record(current_state)
+                while steps < max_steps:
+                    if mdp.is_terminal(current_state):
+                        print("All items collected and returned to start.")
+                        break
 
-            action = pi.get(current_state)
-            if action is None:
-                break
+                    action = next(moves, None) if moves is not None else pi.get(current_state)
+                    if action is None:
+                        break
+                    
+                    # Get next state and reward
+                    next_state, reward = mdp.step(current_state, action)
+                    recorder.record(next_state, reward)
                 
-            # Get next state and reward
-            next_state, reward = mdp.step(current_state, action)
-            rewards.append(reward)
-            
-            current_state = next_state
-            path.append(current_state[0])
-            state_history.append(current_state)
-            steps += 1
+                    current_state = next_state
+                    steps += 1
         
-        print(f"Path length: {len(path)}")
-        goal_history = [state[2] for state in state_history]
-        animate_path(sim_gw, path, 
-                    fps=cfg.get("render_fps", 4),
-                    step_delay=cfg.get("step_delay", 0.3),
-                    rewards=rewards,
-                    goal_history=goal_history,
-                    goal_positions=mdp.goal_positions)  # Pass rewards to visualization
+            print(f"Path length: {recorder.count} (recorded to {traj_file})")
+            try:
+                animate_path(sim_gw,
+                            fps=cfg.get("render_fps", 4),
+                            step_delay=cfg.get("step_delay", 0.3),
+                            headless=cfg.get("headless", False),
+                            output=cfg.get("frames_output"),
+                            **TrajectoryReader(traj_file).replay_kwargs())  # lazy path, rewards and goal history
+            finally:
+                if not cfg.get("trajectory_file"):
+                    os.remove(traj_file)
+    finally:
+        if hasattr(agent, "close"):
+            agent.close()  # removes the chunked solver's temporary memmaps
 
     print("Demo finished.")
 
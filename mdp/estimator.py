@@ -0,0 +1,209 @@
+# mdp/estimator.py
+"""
+State-space size and cost estimator for the solvers, plus a dispatcher that picks
+the most exact solver whose projected memory and run time fit a budget.
+- exact state count: free cells x (capacity+1) x prod(items_per_goal+1)
+- per-solver projected memory (bytes) and time per sweep / episode (seconds)
+- select_solver walks SOLVERS from most to least exact and downgrades with a message
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+from planners.goal_dp import goal_dp_table_bytes
+
+# Rough CPython footprint of one tabular state: state tuple + V entry + float + pi entry.
+# The goals tuple grows by one pointer per goal cell.
+TABULAR_BYTES_PER_STATE = 350
+TABULAR_BYTES_PER_GOAL = 8
+# vi_mode='gauss_seidel' working set per (action, state): next index (int64) and reward
+# (float64) arrays, their relabelled copies and the sort behind the CSR predecessor index.
+GS_BYTES_PER_TRANSITION = 56
+# One-time cost per state of building those arrays and then the dict V / pi tables.
+GS_SETUP_SECONDS_PER_STATE = 4e-6
+# vi_mode='prioritized': predecessor sets and residual heap on top of the tabular dicts.
+PRIORITIZED_BYTES_PER_STATE = 550
+# One Q-table row: state key + dict of len(actions) floats.
+LEARNING_BYTES_PER_STATE = 550
+# Fallback cost of one SimpleMDPModel.step call when it is not measured.
+DEFAULT_STEP_SECONDS = 2e-6
+# Vectorized backup (one state, one action) in the chunked solver, including memmap reads.
+VECTOR_SECONDS_PER_BACKUP = 2e-7
+# Working set per state of one chunk (index/value/reward temporaries) and disk per state (V + pi).
+CHUNK_BYTES_PER_STATE = 160
+CHUNK_DISK_BYTES_PER_STATE = 5
+DEFAULT_CHUNK_SIZE = 1 << 16
+# One vectorized (code, goal, carried, next goal) update of the exact goal-level DP.
+GOAL_DP_SECONDS_PER_OP = 2e-8
+# Batched BFS cost per (source, free cell) for the route optimizer's distance maps.
+ROUTE_SECONDS_PER_SOURCE_CELL = 4e-7
+DEFAULT_ROUTE_BUDGET = 2.0
+# One environment step of the linear function-approximation agent (features + batched update).
+LINEAR_STEP_SECONDS = 4e-5
+
+# Solvers in order of preference (most exact first). goal_dp ignores pickups on goal cells its
+# legs pass through, so its value only estimates the model's and it ranks after the tabular solvers.
+SOLVERS = ['value_iteration', 'chunked_value_iteration', 'goal_dp', 'route_optimizer', 'q_learning', 'linear_q']
+# Solvers charged per episode rather than per sweep.
+LEARNING_SOLVERS = {'q_learning', 'linear_q'}
+# Solvers that run once (charged a single "sweep").
+ONE_SHOT_SOLVERS = {'goal_dp', 'route_optimizer'}
+# Learning solvers that need to visit every state (skipped when samples < states).
+TABULAR_LEARNING_SOLVERS = {'q_learning'}
+
+def count_free_cells(gw):
+    return int((gw.grid != 1).sum())
+
+def count_states(gw, carry_capacity=3):
+    """Exact number of tabular states SimpleMDPModel.get_all_states would produce."""
+    n = count_free_cells(gw) * (carry_capacity + 1)
+    for items in gw.goal_cells.values():
+        n *= items + 1
+    return n
+
+def measure_step_cost(mdp, samples=2000):
+    """Average wall-clock seconds of one mdp.step on random valid states."""
+    positions = [(r, c) for r in range(mdp.size) for c in range(mdp.size) if mdp.gw.grid[r, c] != 1]
+    states = []
+    for _ in range(min(samples, 200)):
+        goals = tuple(random.randint(0, g) for g in mdp.goal_initial)
+        states.append((random.choice(positions), random.randint(0, mdp.capacity), goals))
+    t0 = time.perf_counter()
+    for i in range(samples):
+        mdp.step(states[i % len(states)], mdp.actions[i % len(mdp.actions)])
+    return (time.perf_counter() - t0) / samples
+
+def available_memory():
+    """Physical memory in bytes, or 4 GiB if the platform does not report it."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return 4 * 1024**3
+
+def available_disk(path=None):
+    """Free bytes on the file system holding path (default: the temp directory)."""
+    return shutil.disk_usage(path or tempfile.gettempdir()).free
+
+def estimate(gw, carry_capacity=3, num_actions=5, step_seconds=None, episodes=2000, max_steps=500,
+             chunk_size=DEFAULT_CHUNK_SIZE, batch_size=32, route_budget=DEFAULT_ROUTE_BUDGET, num_starts=1,
+             vi_mode='sync'):
+    """
+    Returns a dict with the exact state count and, per solver, projected
+    'memory_bytes', 'disk_bytes' and 'sweep_seconds' (one full sweep for planning
+    solvers, one episode for learning solvers), plus 'setup_seconds' for one-time work.
+    num_starts: candidate starts solved together (goal_dp tables get a start axis,
+    the route optimizer one more BFS source per start).
+    vi_mode: ValueIterationAgent mode the 'value_iteration' entry is charged for.
+    """
+    step_seconds = step_seconds or DEFAULT_STEP_SECONDS
+    num_goals = len(gw.goal_cells)
+    num_states = count_states(gw, carry_capacity)
+    visited = min(num_states, episodes * max_steps)
+    free_cells = count_free_cells(gw)
+    num_features = 7 + carry_capacity + 1 + 2 * num_goals
+    goal_codes = 1
+    for items in gw.goal_cells.values():
+        goal_codes *= items + 1
+    solvers = {
+        'goal_dp': {
+            'memory_bytes': goal_dp_table_bytes(goal_codes, num_goals, carry_capacity, num_starts)
+                            + (num_goals + num_starts) * free_cells * 4,
+            'sweep_seconds': goal_codes * (num_goals + 1) ** 2 * carry_capacity * num_starts * GOAL_DP_SECONDS_PER_OP,
+            'disk_bytes': 0,
+        },
+        'value_iteration': _value_iteration_cost(num_states, num_goals, num_actions, step_seconds, vi_mode),
+        'chunked_value_iteration': {
+            'memory_bytes': min(num_states, chunk_size) * CHUNK_BYTES_PER_STATE,
+            'sweep_seconds': num_states * num_actions * VECTOR_SECONDS_PER_BACKUP,
+            'disk_bytes': num_states * CHUNK_DISK_BYTES_PER_STATE,
+        },
+        'route_optimizer': {
+            'memory_bytes': (num_goals + num_starts) * (free_cells + num_goals + num_starts) * 4,
+            'sweep_seconds': (num_goals + num_starts) * free_cells * ROUTE_SECONDS_PER_SOURCE_CELL + route_budget,
+            'disk_bytes': 0,
+        },
+        'q_learning': {
+            'memory_bytes': visited * (LEARNING_BYTES_PER_STATE + TABULAR_BYTES_PER_GOAL * num_goals),
+            'sweep_seconds': max_steps * 3 * step_seconds,
+            'disk_bytes': 0,
+        },
+        'linear_q': {
+            'memory_bytes': (batch_size * (num_actions + 1) * num_features + num_goals * free_cells) * 8,
+            'sweep_seconds': max_steps * LINEAR_STEP_SECONDS,
+            'disk_bytes': 0,
+        },
+    }
+    for proj in solvers.values():
+        proj.setdefault('setup_seconds', 0.0)
+    return {
+        'free_cells': free_cells,
+        'num_goals': num_goals,
+        'num_states': num_states,
+        'samples': episodes * max_steps,
+        'solvers': solvers,
+    }
+
+def _value_iteration_cost(num_states, num_goals, num_actions, step_seconds, vi_mode):
+    tabular = num_states * (TABULAR_BYTES_PER_STATE + TABULAR_BYTES_PER_GOAL * num_goals)
+    if vi_mode == 'gauss_seidel':
+        # vectorized sweeps over transition arrays; the dict tables are built after they are freed
+        return {
+            'memory_bytes': max(tabular, num_states * num_actions * GS_BYTES_PER_TRANSITION),
+            'sweep_seconds': num_states * num_actions * VECTOR_SECONDS_PER_BACKUP,
+            'setup_seconds': num_states * GS_SETUP_SECONDS_PER_STATE,
+            'disk_bytes': 0,
+        }
+    if vi_mode == 'prioritized':
+        tabular += num_states * PRIORITIZED_BYTES_PER_STATE
+    return {
+        'memory_bytes': tabular,
+        'sweep_seconds': num_states * (num_actions + 1) * step_seconds,
+        'disk_bytes': 0,
+    }
+
+def _fmt_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}PB"
+
+def select_solver(est, memory_budget=None, time_budget=3600.0, expected_sweeps=100, episodes=2000,
+                  disk_budget=None):
+    """
+    Pick the first solver in SOLVERS whose projected memory, disk and total time fit.
+    Planning solvers are charged expected_sweeps sweeps, learning solvers `episodes` episodes.
+    Returns (solver_name or None, message); None means the configuration is refused.
+    """
+    memory_budget = memory_budget or available_memory() // 2
+    disk_budget = disk_budget or available_disk() // 2
+    reasons = []
+    for name in SOLVERS:
+        proj = est['solvers'].get(name)
+        if proj is None:
+            continue
+        if name in LEARNING_SOLVERS:
+            runs = episodes
+        elif name in ONE_SHOT_SOLVERS:
+            runs = 1
+        else:
+            runs = expected_sweeps
+        total = proj['setup_seconds'] + proj['sweep_seconds'] * runs
+        if name in TABULAR_LEARNING_SOLVERS and est['samples'] < est['num_states']:
+            reasons.append(f"{name}: {est['samples']:,} samples cannot cover {est['num_states']:,} states")
+            continue
+        if proj['memory_bytes'] > memory_budget:
+            reasons.append(f"{name}: needs {_fmt_bytes(proj['memory_bytes'])} > budget {_fmt_bytes(memory_budget)}")
+            continue
+        if proj['disk_bytes'] > disk_budget:
+            reasons.append(f"{name}: needs {_fmt_bytes(proj['disk_bytes'])} disk > budget {_fmt_bytes(disk_budget)}")
+            continue
+        if total > time_budget:
+            reasons.append(f"{name}: ~{total:.0f}s > budget {time_budget:.0f}s")
+            continue
+        msg = f"{est['num_states']:,} states -> {name} (~{_fmt_bytes(proj['memory_bytes'])}, ~{total:.1f}s)"
+        if reasons:
+            msg += " [downgraded: " + "; ".join(reasons) + "]"
+        return name, msg
+    return None, f"{est['num_states']:,} states: no solver fits (" + "; ".join(reasons) + ")"
@@ -6,6 +6,7 @@ State representation (for tabular RL): (r, c, carried, goals_state_key)
 Note: This MDP is for small-scale tabular methods; for more complex RL you'd need function approximation.
 """
 
+import copy
 import itertools
 import numpy as np
 from collections import OrderedDict
@@ -33,6 +34,18 @@ class SimpleMDPModel:
         self.return_reward = 20.0
         self.start = gridworld.start
 
+    def with_start(self, start):
+        """
+        The same model with another start / drop cell. Start-independent parts
+        (grid, goal layout, compiled index and transition tables) are shared;
+        only the start index is replaced.
+        """
+        other = copy.copy(self)
+        other.start = start
+        if getattr(self, '_positions', None) is not None:
+            other._start_index = self._pos_index[start]
+        return other
+
     def is_terminal(self, state):
         """
         Terminal when:
@@ -76,29 +89,131 @@ class SimpleMDPModel:
         return ((nr, nc), carried, tuple(new_goals)), reward
     def get_all_states(self):
         """
-        Generate all possible states for tabular RL.
+        Generate all possible states for tabular RL, lazily.
         State: (position, carried_items, goals_state)
+        Order matches state_index(): position, then carried, then goal counts
+        (last goal varying fastest). Nothing is materialized beyond one state.
         """
-        # Get all valid positions (non-obstacle cells)
-        positions = []
-        for r in range(self.size):
-            for c in range(self.size):
-                if self.gw.grid[r,c] != 1:  # not obstacle
-                    positions.append((r,c))
-                    
-        # All possible carried amounts
-        carried_amounts = range(self.capacity + 1)
-        
         # All possible goal states
         # For each goal, items can range from 0 to initial amount
         goal_ranges = [range(g + 1) for g in self.goal_initial]
-        goal_states = list(itertools.product(*goal_ranges))
-        
+
         # Generate all combinations
-        states = []
-        for pos in positions:
-            for carried in carried_amounts:
-                for goals in goal_states:
-                    states.append((pos, carried, goals))
-                    
-        return states
+        for pos in self.free_positions():
+            for carried in range(self.capacity + 1):
+                for goals in itertools.product(*goal_ranges):
+                    yield (pos, carried, goals)
+
+    def free_positions(self):
+        # All valid positions (non-obstacle cells), row-major
+        return [(r,c) for r in range(self.size) for c in range(self.size) if self.gw.grid[r,c] != 1]
+
+    # ------------------------------------------------------------------
+    # Indexed enumeration: state <-> integer in [0, num_states()) using a
+    # mixed radix (position, carried, goal_0 .. goal_k). Used by the
+    # vectorized / chunked solvers, which work on index arrays only.
+    # ------------------------------------------------------------------
+    def _build_index(self):
+        if getattr(self, '_positions', None) is not None:
+            return
+        self._positions = self.free_positions()
+        self._pos_index = {p: i for i, p in enumerate(self._positions)}
+        radix = np.array([g + 1 for g in self.goal_initial], dtype=np.int64)
+        # stride of goal k = product of radices of the goals after it
+        self._goal_strides = np.ones(len(radix), dtype=np.int64)
+        for k in range(len(radix) - 2, -1, -1):
+            self._goal_strides[k] = self._goal_strides[k + 1] * radix[k + 1]
+        self._goal_radix = radix
+        self._goal_codes = int(np.prod(radix)) if len(radix) else 1
+        # next position index for every (position, action)
+        n = len(self._positions)
+        self._next_pos = np.empty((n, len(self.actions)), dtype=np.int64)
+        for i, (r, c) in enumerate(self._positions):
+            for a, (dr, dc) in enumerate(self.actions):
+                nr, nc = r + dr, c + dc
+                if not (0 <= nr < self.size and 0 <= nc < self.size) or self.gw.grid[nr, nc] == 1:
+                    nr, nc = r, c
+                self._next_pos[i, a] = self._pos_index[(nr, nc)]
+        # goal index at every position (-1 for none)
+        self._goal_at = np.full(n, -1, dtype=np.int64)
+        for k, g in enumerate(self.goal_positions):
+            if g in self._pos_index:
+                self._goal_at[self._pos_index[g]] = k
+        self._start_index = self._pos_index[self.start]
+
+    def num_states(self):
+        self._build_index()
+        return len(self._positions) * (self.capacity + 1) * self._goal_codes
+
+    def state_index(self, state):
+        """Integer index of a state; raises KeyError for a position on an obstacle."""
+        self._build_index()
+        pos, carried, goals = state
+        code = int(np.dot(np.asarray(goals, dtype=np.int64), self._goal_strides)) if goals else 0
+        return (self._pos_index[pos] * (self.capacity + 1) + carried) * self._goal_codes + code
+
+    def index_state(self, index):
+        """Inverse of state_index."""
+        self._build_index()
+        index = int(index)
+        pos_i, rem = divmod(index, (self.capacity + 1) * self._goal_codes)
+        carried, code = divmod(rem, self._goal_codes)
+        goals = tuple(int(code // s % r) for s, r in zip(self._goal_strides, self._goal_radix))
+        return (self._positions[pos_i], carried, goals)
+
+    def terminal_index(self):
+        self._build_index()
+        return self._start_index * (self.capacity + 1) * self._goal_codes
+
+    def step_indices(self, idx, action_index):
+        """
+        Vectorized step(): idx is an int64 array of state indices, action_index
+        an index into self.actions. Returns (next_idx, reward) arrays.
+        """
+        self._build_index()
+        P = self._goal_codes
+        C = self.capacity + 1
+        pos_i, rem = np.divmod(idx, C * P)
+        carried, code = np.divmod(rem, P)
+        npos = self._next_pos[pos_i, action_index]
+        reward = np.full(idx.shape, self.step_cost)
+        # automatic pick-up on a goal cell, limited by remaining capacity
+        k = self._goal_at[npos]
+        on_goal = k >= 0
+        k = np.where(on_goal, k, 0)
+        stride = self._goal_strides[k] if len(self._goal_strides) else np.ones_like(k)
+        radix = self._goal_radix[k] if len(self._goal_radix) else np.ones_like(k)
+        count = code // stride % radix
+        pick = np.where(on_goal, np.minimum(count, self.capacity - carried), 0)
+        code = code - pick * stride
+        carried = carried + pick
+        reward += pick * self.pick_reward
+        # drop everything carried at the start cell
+        drop = np.where(npos == self._start_index, carried, 0)
+        reward += drop * self.return_reward
+        carried = carried - drop
+        return (npos * C + carried) * P + code, reward
+
+    def map_state(self, state, other):
+        """
+        Translate a state of another (nearby) SimpleMDPModel into this model.
+        Goal counts are matched by goal position; goals that only exist here are
+        treated as already emptied. Returns None when the state has no counterpart
+        (robot on a new obstacle, items left at a removed goal, counts out of range).
+        """
+        pos, carried, goals = state
+        r, c = pos
+        if not (0 <= r < self.size and 0 <= c < self.size) or self.gw.grid[r, c] == 1:
+            return None
+        if carried > self.capacity:
+            return None
+        counts = dict(zip(other.goal_positions, goals))
+        new_goals = []
+        for g, initial in zip(self.goal_positions, self.goal_initial):
+            n = counts.pop(g, 0)
+            if n > initial:
+                return None
+            new_goals.append(n)
+        if any(counts.values()):
+            return None
+        return (pos, carried, tuple(new_goals))
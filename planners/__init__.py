@@ -1,4 +1,7 @@
 # planners/__init__.py
-from .bfs import bfs_grid
+from .bfs import bfs_grid, bfs_distances
 from .dijkstra import dijkstra_grid
 from .astar import astar_grid
+from .routing import distance_matrix, plan_collection_routes, plan_states, plan_actions, evaluate_plan
+from .goal_dp import GoalDP, solve_goal_dp
+from .multi_agent import ReservationTable, space_time_astar, prioritized_plan, simulate_fleet
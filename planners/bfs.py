@@ -1,5 +1,6 @@
 # planners/bfs.py
 from collections import deque
+import numpy as np
 
 def bfs_grid(grid, start, goal):
     """
@@ -33,3 +34,25 @@ def bfs_grid(grid, start, goal):
                 return path[::-1]
             q.append(nb)
     return []
+
+def bfs_distances(grid, start):
+    """
+    One-to-many BFS: returns an int array shaped like grid with the number of
+    steps from start to every cell (-1 for obstacles / unreachable cells).
+    """
+    R,C = grid.shape
+    dist = np.full((R,C), -1, dtype=np.int32)
+    dist[start] = 0
+    q = deque([start])
+    while q:
+        cur = q.popleft()
+        d = dist[cur] + 1
+        for dr,dc in ((1,0),(-1,0),(0,1),(0,-1)):
+            nb = (cur[0]+dr, cur[1]+dc)
+            if not (0 <= nb[0] < R and 0 <= nb[1] < C):
+                continue
+            if grid[nb] == 1 or dist[nb] >= 0:
+                continue
+            dist[nb] = d
+            q.append(nb)
+    return dist
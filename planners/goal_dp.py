@@ -0,0 +1,208 @@
+# planners/goal_dp.py
+"""
+Held-Karp style dynamic program over goal subsets for collection tours.
+State: (remaining-items code, last stop, carried). The code is mixed radix over the
+goals' remaining items, which is a plain visited-goal bitmask when every goal holds
+one item. Stops are the start and the goal cells, legs are shortest paths from
+planners.routing.distance_matrix; picking is automatic (min(remaining, free capacity))
+and everything carried is dropped at the start, as in SimpleMDPModel.
+Values are discounted per step with the same rewards as SimpleMDPModel, but a leg
+ignores the goal cells and start it passes through, where the model picks / drops
+automatically. The value is therefore an estimate of the model's return: it matches
+value iteration's V(start) when no shortest leg passes through another goal cell or
+the start, and may be above or below it otherwise. plan() replays the chosen trips
+under the model (see planners.routing.trips_to_plan).
+Tables are float32 NumPy arrays indexed by code; levels (items remaining) are
+solved in increasing order, vectorized over all codes of a level.
+Several candidate starts (e.g. the four corners) are solved together: every table
+gets a trailing start axis, the goal-to-goal legs are shared and only the legs to
+and from each start differ, so picking the best dock costs about one solve.
+"""
+import numpy as np
+from .routing import distance_matrix, trips_to_plan
+
+def goal_dp_table_bytes(num_codes, num_goals, carry_capacity, num_starts=1):
+    """Memory of the value tables plus per-code bookkeeping (level int16, order int64)."""
+    return num_codes * (4 * num_starts * (1 + num_goals * (carry_capacity + 1)) + 2 + 8)
+
+class GoalDP:
+    def __init__(self, gw, carry_capacity=3, gamma=0.99, goal_cells=None,
+                 step_cost=-1.0, pick_reward=10.0, return_reward=20.0, starts=None):
+        """starts: candidate start cells (default [gw.start]); they must not be goal cells."""
+        self.gw = gw
+        self.capacity = carry_capacity
+        self.gamma = gamma
+        self.step_cost = step_cost
+        self.pick_reward = pick_reward
+        self.return_reward = return_reward
+        self.goal_cells = dict(gw.goal_cells if goal_cells is None else goal_cells)
+        self.goal_positions = list(self.goal_cells.keys())
+        G = len(self.goal_positions)
+        self.starts = [gw.start] if starts is None else list(starts)
+        if not self.starts:
+            raise ValueError("at least one start cell is required")
+        if any(st in self.goal_cells for st in self.starts):
+            raise ValueError("a start cell cannot be a goal cell")
+        S = len(self.starts)
+        # one batched BFS from every start and goal; -1 marks a goal a start cannot reach
+        Dall, maps = distance_matrix(gw.grid, self.starts + self.goal_positions)
+        self.Dgg = Dall[S:, S:]        # goal -> goal, shared by all starts
+        self.Dout = Dall[:S, S:]       # (starts, goals) start -> goal
+        self.Dback = Dall[S:, :S].T    # (starts, goals) goal -> start
+        self.start_maps, self.goal_maps = maps[:S], maps[S:]
+        self.D, self.maps = self.start_view(0)
+        self.radix = np.array([self.goal_cells[g] + 1 for g in self.goal_positions], dtype=np.int64)
+        self.strides = np.ones(G, dtype=np.int64)
+        for k in range(G - 2, -1, -1):
+            self.strides[k] = self.strides[k + 1] * self.radix[k + 1]
+        self.num_codes = int(np.prod(self.radix)) if G else 1
+        self.Vs = None  # value at the start, nothing carried: (codes, starts)
+        self.Vg = None  # value at goal g carrying c: (codes, G, capacity+1, starts)
+
+    def start_view(self, s):
+        """(D, maps) over [starts[s]] + goals, the node layout used by planners.routing."""
+        G = len(self.goal_positions)
+        D = np.empty((G + 1, G + 1), dtype=self.Dgg.dtype)
+        D[0, 0] = 0
+        D[0, 1:], D[1:, 0], D[1:, 1:] = self.Dout[s], self.Dback[s], self.Dgg
+        return D, np.concatenate([self.start_maps[s:s + 1], self.goal_maps])
+
+    def _leg(self, d, arrival):
+        # discounted return of a d-step leg whose last step earns `arrival`, and the continuation factor;
+        # unreachable legs (d < 0) are worth -inf
+        g = self.gamma
+        d = np.asarray(d, dtype=np.float64)
+        steps = d if g == 1.0 else (1.0 - g ** d) / (1.0 - g)
+        r = self.step_cost * steps + g ** (d - 1.0) * arrival
+        return np.where(d < 0, -np.inf, r), g ** d
+
+    def solve(self):
+        G, cap = len(self.goal_positions), self.capacity
+        P = self.num_codes
+        codes = np.arange(P, dtype=np.int64)
+        level = np.zeros(P, dtype=np.int16)
+        for k in range(G):
+            level += (codes // self.strides[k] % self.radix[k]).astype(np.int16)
+        order = np.argsort(level, kind='stable')
+        bounds = np.searchsorted(level[order], np.arange(level.max() + 2 if P else 1))
+        del codes, level
+        S = len(self.starts)
+        Dgg = self.Dgg.astype(np.float64)
+        Vs = np.full((P, S), -np.inf, dtype=np.float32)
+        Vg = np.full((P, G, cap + 1, S), -np.inf, dtype=np.float32)
+        for L in range(len(bounds) - 1):
+            idx = order[bounds[L]:bounds[L + 1]]
+            if len(idx) == 0:
+                continue
+            digits = [idx // self.strides[k] % self.radix[k] for k in range(G)]
+            # at the start with nothing carried: drive to some goal with items left
+            if L == 0:
+                Vs[idx] = 0.0
+            else:
+                best = np.full((len(idx), S), -np.inf)
+                for k in range(G):
+                    pick = np.minimum(digits[k], cap)
+                    ok = pick > 0
+                    if not ok.any():
+                        continue
+                    # per-start leg: (items, starts)
+                    r, disc = self._leg(self.Dout[:, k], pick[ok, None] * self.pick_reward)
+                    nxt = idx[ok] - pick[ok] * self.strides[k]
+                    cand = np.full((len(idx), S), -np.inf)
+                    cand[ok] = r + disc * Vg[nxt, k, pick[ok]]
+                    np.maximum(best, cand, out=best)
+                Vs[idx] = best
+            # at goal g carrying c: return to start, or continue to another goal if not full
+            for g in range(G):
+                for c in range(1, cap + 1):
+                    r, disc = self._leg(self.Dback[:, g], c * self.return_reward)
+                    best = r + disc * Vs[idx].astype(np.float64)
+                    if c < cap:
+                        for k in range(G):
+                            if k == g:
+                                continue
+                            pick = np.minimum(digits[k], cap - c)
+                            ok = pick > 0
+                            if not ok.any():
+                                continue
+                            # goal-to-goal leg, shared by every start
+                            r2, disc2 = self._leg(Dgg[g, k], pick[ok, None] * self.pick_reward)
+                            nxt = idx[ok] - pick[ok] * self.strides[k]
+                            cand = np.full((len(idx), S), -np.inf)
+                            cand[ok] = r2 + disc2 * Vg[nxt, k, c + pick[ok]]
+                            np.maximum(best, cand, out=best)
+                    Vg[idx, g, c] = best
+        self.Vs, self.Vg = Vs, Vg
+        return self
+
+    def value(self, s=0):
+        """Estimated discounted return from starts[s] with all items remaining."""
+        return float(self.Vs[self.num_codes - 1, s])
+
+    def values(self):
+        """Estimated return for every candidate start (-inf when a start cannot reach every goal)."""
+        return self.Vs[self.num_codes - 1].astype(np.float64)
+
+    def best_start(self):
+        """Index into self.starts of the start with the highest estimated return."""
+        if self.Vs is None:
+            self.solve()
+        return int(np.argmax(self.values()))
+
+    def _choices(self, code, last, carried, s=0):
+        # (value, next stop, pick) for every successor of a state, as in solve()
+        cap = self.capacity
+        D = self.D if s == 0 else self.start_view(s)[0]
+        out = []
+        if last != 0:
+            r, disc = self._leg(D[last, 0], carried * self.return_reward)
+            out.append((float(r) + float(disc) * float(self.Vs[code, s]), 0, 0))
+        if last == 0 or carried < cap:
+            for k in range(len(self.goal_positions)):
+                if k + 1 == last:
+                    continue
+                pick = min(code // int(self.strides[k]) % int(self.radix[k]), cap - carried)
+                if pick <= 0:
+                    continue
+                r, disc = self._leg(D[last, k + 1], pick * self.pick_reward)
+                out.append((float(r) + float(disc) * float(self.Vg[code - pick * int(self.strides[k]), k, carried + pick, s]),
+                            k + 1, pick))
+        return out
+
+    def plan(self, s=None):
+        """
+        Follow the best choices from starts[s] (default: the best start); returns a
+        planners.routing plan dict with 'start' and 'value' (the DP estimate) added.
+        Check it against the model with planners.routing.evaluate_plan.
+        """
+        if self.Vs is None:
+            self.solve()
+        if s is None:
+            s = self.best_start()
+        if not np.isfinite(self.value(s)):
+            raise ValueError(f"start {self.starts[s]} cannot reach every goal")
+        code, last, carried = self.num_codes - 1, 0, 0
+        trips, trip = [], []
+        while code or carried:
+            _, nxt, pick = max(self._choices(code, last, carried, s), key=lambda t: t[0])
+            if nxt == 0:
+                trips.append(trip)
+                trip, carried = [], 0
+            else:
+                trip.append([nxt, pick])
+                code -= pick * int(self.strides[nxt - 1])
+                carried += pick
+            last = nxt
+        _, maps = self.start_view(s)
+        plan = trips_to_plan(self.gw, self.goal_cells, trips, maps, self.capacity, start=self.starts[s],
+                             step_cost=self.step_cost, pick_reward=self.pick_reward,
+                             return_reward=self.return_reward)
+        plan['value'] = self.value(s)
+        return plan
+
+def solve_goal_dp(gw, carry_capacity=3, gamma=0.99, goal_cells=None, starts=None):
+    """
+    Collection plan from the goal-level DP (see GoalDP); plan['value'] is its estimated return.
+    With several starts they are solved together and the plan from the best one is returned.
+    """
+    return GoalDP(gw, carry_capacity, gamma, goal_cells, starts=starts).solve().plan()
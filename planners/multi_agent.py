@@ -0,0 +1,223 @@
+# planners/multi_agent.py
+"""
+Multi-robot prioritized planning (cooperative / windowed hierarchical A*).
+- ReservationTable: hashed (timestep * cells + cell) -> robot, plus parked cells
+- space_time_astar: A* over (cell, t) with wait moves, avoiding reserved cells and
+  swaps; the heuristic is the exact BFS distance to the goal
+- prioritized_plan: robots plan one after another, each reserving its path
+- simulate_fleet: pick-and-return fleet with windowed replanning; reports throughput
+Each robot's search is bounded by the window, so planning cost grows roughly
+linearly with the number of robots.
+"""
+import heapq
+import time
+from .bfs import bfs_distances
+
+MOVES = ((0,0),(1,0),(-1,0),(0,1),(0,-1))  # wait first
+
+class ReservationTable:
+    def __init__(self, shape):
+        self.cols = shape[1]
+        self.ncells = shape[0] * shape[1]
+        self.slots = {}    # t * ncells + cell -> robot
+        self.parked = {}   # cell -> (t_from, robot), occupied from t_from onwards
+        self.latest = {}   # cell -> last reserved timestep
+
+    def _cell(self, pos):
+        return pos[0] * self.cols + pos[1]
+
+    def owner(self, pos, t):
+        cell = self._cell(pos)
+        robot = self.slots.get(t * self.ncells + cell)
+        if robot is None and cell in self.parked and t >= self.parked[cell][0]:
+            robot = self.parked[cell][1]
+        return robot
+
+    def is_free(self, pos, t, robot=None):
+        owner = self.owner(pos, t)
+        return owner is None or owner == robot
+
+    def swap_free(self, a, b, t, robot=None):
+        # no other robot moving b -> a while we move a -> b between t and t+1
+        other = self.owner(b, t)
+        return other is None or other == robot or self.owner(a, t + 1) != other
+
+    def can_park(self, pos, t, robot=None):
+        # nobody else needs this cell at or after t
+        cell = self._cell(pos)
+        if cell in self.parked and self.parked[cell][1] != robot:
+            return False
+        return self.latest.get(cell, -1) < t
+
+    def reserve(self, path, robot, t0=0, park_until=None):
+        """Reserve path (positions from t0); park on the last cell forever or until park_until."""
+        for k, pos in enumerate(path):
+            cell = self._cell(pos)
+            self.slots[(t0 + k) * self.ncells + cell] = robot
+            self.latest[cell] = max(self.latest.get(cell, -1), t0 + k)
+        if path:
+            last = path[-1]
+            t_end = t0 + len(path) - 1
+            if park_until is None:
+                self.parked[self._cell(last)] = (t_end, robot)
+            else:
+                for t in range(t_end + 1, park_until + 1):
+                    self.slots[t * self.ncells + self._cell(last)] = robot
+                self.latest[self._cell(last)] = max(self.latest.get(self._cell(last), -1), park_until)
+
+def space_time_astar(grid, start, goal, reservations, robot=None, t0=0, window=None, max_time=None,
+                     dist_to_goal=None):
+    """
+    Collision-free path (positions from t0) for one robot given other robots' reservations.
+    With window, the search stops at t0+window and returns the best partial path.
+    Returns [] when no path exists (the robot should wait).
+    """
+    R, C = grid.shape
+    h = dist_to_goal if dist_to_goal is not None else bfs_distances(grid, goal)
+    if h[start] < 0:
+        return []
+    horizon = t0 + (window if window is not None else (max_time or 2 * R * C))
+    open_heap = [(int(h[start]), 0, t0, start)]
+    parent = {(start, t0): None}
+    closed = set()
+    while open_heap:
+        f, g, t, cur = heapq.heappop(open_heap)
+        if (cur, t) in closed:
+            continue
+        closed.add((cur, t))
+        reached = cur == goal and (window is not None or reservations.can_park(cur, t, robot))
+        if reached or t >= horizon:
+            path = []
+            node = (cur, t)
+            while node is not None:
+                path.append(node[0])
+                node = parent[node]
+            return path[::-1]
+        for dr, dc in MOVES:
+            nb = (cur[0] + dr, cur[1] + dc)
+            if not (0 <= nb[0] < R and 0 <= nb[1] < C) or grid[nb] == 1:
+                continue
+            if (nb, t + 1) in closed or h[nb] < 0:
+                continue
+            if not reservations.is_free(nb, t + 1, robot) or not reservations.swap_free(cur, nb, t, robot):
+                continue
+            parent.setdefault((nb, t + 1), (cur, t))
+            heapq.heappush(open_heap, (g + 1 + int(h[nb]), g + 1, t + 1, nb))
+    return []
+
+def prioritized_plan(grid, starts, goals, window=None, t0=0, order=None, dist_maps=None):
+    """
+    Plan robots in priority order (default: index order). Each robot avoids the
+    reservations of the robots planned before it. Returns (paths, reservations).
+    dist_maps: optional {goal: bfs distance map} cache.
+    """
+    reservations = ReservationTable(grid.shape)
+    dist_maps = {} if dist_maps is None else dist_maps
+    # everyone's current cell is taken at t0
+    for i, s in enumerate(starts):
+        reservations.slots[t0 * reservations.ncells + reservations._cell(s)] = i
+    paths = [None] * len(starts)
+    for i in (order if order is not None else range(len(starts))):
+        goal = goals[i]
+        if goal not in dist_maps:
+            dist_maps[goal] = bfs_distances(grid, goal)
+        path = space_time_astar(grid, starts[i], goal, reservations, robot=i, t0=t0,
+                                window=window, dist_to_goal=dist_maps[goal]) or [starts[i]]
+        reservations.reserve(path, i, t0, park_until=t0 + window if window is not None else None)
+        paths[i] = path
+    return paths, reservations
+
+def _assign_target(mgw, i, capacity, claims, dist_maps):
+    # nearest goal with unclaimed items while there is room, otherwise the robot's dock
+    pos, carried = mgw.robot_positions[i], mgw.robot_carried[i]
+    if carried < capacity:
+        best, best_d = None, None
+        for g, n in mgw.goal_cells.items():
+            if n - claims.get(g, 0) <= 0:
+                continue
+            if g not in dist_maps:
+                dist_maps[g] = bfs_distances(mgw.grid, g)
+            d = dist_maps[g][pos]
+            if d >= 0 and (best_d is None or d < best_d):
+                best, best_d = g, d
+        if best is not None:
+            claims[best] = claims.get(best, 0) + min(capacity - carried, mgw.goal_cells[best] - claims.get(best, 0))
+            return best
+    return mgw.docks[i]
+
+def simulate_fleet(mgw, carry_capacity=3, window=8, replan_every=4, max_steps=2000):
+    """
+    Run all robots until every item is delivered to a dock (or max_steps).
+    Robots pick automatically on their target goal and drop at their own dock.
+    Returns stats: steps, delivered, throughput (items / step), planning time,
+    average planning time per replan, blocked moves, per-robot paths.
+    """
+    n = mgw.num_robots
+    total_items = mgw.goals_remaining()
+    paths = [[p] for p in mgw.robot_positions]
+    dist_maps = {}
+    delivered = blocked = replans = 0
+    plan_time = 0.0
+    plans = None
+    cursor = [0] * n  # index of each robot's current cell in its plan
+    plan_t0 = t = 0
+    order = list(range(n))
+    while t < max_steps and (delivered < total_items):
+        # replan on a fixed cadence, or as soon as some robot finished its task
+        if plans is None or (t - plan_t0) % replan_every == 0:
+            claims = {}
+            targets = [_assign_target(mgw, i, carry_capacity, claims, dist_maps) for i in range(n)]
+            t_start = time.perf_counter()
+            plans, _ = prioritized_plan(mgw.grid, mgw.robot_positions, targets, window=window, t0=t,
+                                        order=order, dist_maps=dist_maps)
+            plan_time += time.perf_counter() - t_start
+            replans += 1
+            order = order[1:] + order[:1]  # rotate priorities to avoid starvation
+            plan_t0 = t
+            cursor = [0] * n
+        # execute one step; a robot whose next cell is taken waits (and may block others)
+        # and retries the same plan step, so it never skips a cell of its plan
+        ends = [len(plan) - 1 for plan in plans]
+        nxt = [plans[i][min(cursor[i] + 1, ends[i])] for i in range(n)]
+        moving = set(range(n))
+        changed = True
+        while changed:
+            changed = False
+            for i in list(moving):
+                clash = any(nxt[i] == (nxt[j] if j in moving else mgw.robot_positions[j])
+                            for j in range(n) if j != i)
+                swap = any(j in moving and nxt[j] == mgw.robot_positions[i] and nxt[i] == mgw.robot_positions[j]
+                           for j in range(n) if j != i)
+                if (clash or swap) and nxt[i] != mgw.robot_positions[i]:
+                    moving.discard(i)
+                    blocked += 1
+                    changed = True
+        for i in range(n):
+            if i in moving:
+                prev = mgw.robot_positions[i]
+                if abs(nxt[i][0] - prev[0]) + abs(nxt[i][1] - prev[1]) > 1:
+                    raise RuntimeError(f"robot {i} would jump from {prev} to {nxt[i]} at step {t}")
+                mgw.robot_positions[i] = nxt[i]
+                cursor[i] = min(cursor[i] + 1, ends[i])
+            pos = mgw.robot_positions[i]
+            if pos in mgw.goal_cells and mgw.robot_carried[i] < carry_capacity:
+                picked = mgw.pick_items(pos, carry_capacity - mgw.robot_carried[i])
+                if picked:
+                    mgw.robot_carried[i] += picked
+                    plans = None
+            if pos == mgw.docks[i] and mgw.robot_carried[i] > 0:
+                delivered += mgw.robot_carried[i]
+                mgw.robot_carried[i] = 0
+                plans = None
+            paths[i].append(pos)
+        t += 1
+    return {
+        'robots': n,
+        'steps': t,
+        'delivered': delivered,
+        'throughput': delivered / max(t, 1),
+        'planning_time': plan_time,
+        'planning_time_per_replan': plan_time / max(replans, 1),
+        'blocked_moves': blocked,
+        'paths': paths,
+    }
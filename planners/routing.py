@@ -0,0 +1,416 @@
+# planners/routing.py
+"""
+Capacity-constrained multi-trip collection routes for many goal cells.
+- distance_matrix: batched NumPy BFS from the start and every goal cell
+- giant tour over all goals seeded with Clarke-Wright savings, improved by
+  2-opt and or-opt on the distance matrix within a wall-clock budget
+- optimal split of the tour's item sequence into trips of at most
+  carry_capacity items (split deliveries allowed), then per-trip 2-opt
+- the result includes a cell-level path usable by animate_path
+"""
+import itertools
+import time
+import numpy as np
+
+def bfs_distance_maps(grid, sources, batch=64):
+    """
+    Step distances from each source to every cell: int32 array (len(sources), R, C),
+    -1 for obstacles / unreachable cells. Sources are expanded together in batches.
+    """
+    R, C = grid.shape
+    free = grid != 1
+    maps = np.full((len(sources), R, C), -1, dtype=np.int32)
+    for b0 in range(0, len(sources), batch):
+        src = sources[b0:b0 + batch]
+        dist = maps[b0:b0 + len(src)]
+        frontier = np.zeros((len(src), R, C), dtype=bool)
+        for k, (r, c) in enumerate(src):
+            frontier[k, r, c] = True
+            dist[k, r, c] = 0
+        d = 0
+        while frontier.any():
+            d += 1
+            nxt = np.zeros_like(frontier)
+            nxt[:, 1:, :] |= frontier[:, :-1, :]
+            nxt[:, :-1, :] |= frontier[:, 1:, :]
+            nxt[:, :, 1:] |= frontier[:, :, :-1]
+            nxt[:, :, :-1] |= frontier[:, :, 1:]
+            nxt &= free & (dist < 0)
+            dist[nxt] = d
+            frontier = nxt
+    return maps
+
+def distance_matrix(grid, points):
+    """Shortest-path step counts between all points, plus the per-point distance maps."""
+    maps = bfs_distance_maps(grid, points)
+    rows = np.array([p[0] for p in points])
+    cols = np.array([p[1] for p in points])
+    return maps[:, rows, cols], maps
+
+def walk_downhill(dist_map, start, avoid=()):
+    """
+    Cell path from start to the source of dist_map (inclusive), following decreasing distance.
+    Cells in avoid are only entered when no other downhill neighbour exists.
+    Stops early (path not reaching the source) if no downhill neighbour exists.
+    """
+    R, C = dist_map.shape
+    path = [start]
+    r, c = start
+    while dist_map[r, c] > 0:
+        d = dist_map[r, c]
+        step = None
+        for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < R and 0 <= nc < C and dist_map[nr, nc] == d - 1:
+                step = (nr, nc)
+                if step not in avoid:
+                    break
+        if step is None:
+            break
+        r, c = step
+        path.append(step)
+    return path
+
+def _savings_tour(D):
+    # Clarke-Wright savings with unlimited capacity: merge single-goal routes into one tour.
+    # Node 0 is the depot (start), goals are 1..n.
+    n = D.shape[0] - 1
+    if n <= 1:
+        return list(range(1, n + 1))
+    i, j = np.triu_indices(n, k=1)
+    i += 1
+    j += 1
+    savings = D[0, i] + D[0, j] - D[i, j]
+    order = np.argsort(-savings, kind='stable')
+    routes = {k: [k] for k in range(1, n + 1)}
+    route_of = list(range(n + 1))
+    for a, b in zip(i[order].tolist(), j[order].tolist()):
+        ra, rb = route_of[a], route_of[b]
+        if ra == rb:
+            continue
+        A, B = routes[ra], routes[rb]
+        # a must be an end of A and b an end of B
+        if A[-1] != a:
+            if A[0] != a:
+                continue
+            A.reverse()
+        if B[0] != b:
+            if B[-1] != b:
+                continue
+            B.reverse()
+        if len(A) < len(B):
+            # keep the longer list, relabel the shorter one
+            B[:0] = A
+            for k in A:
+                route_of[k] = rb
+            del routes[ra]
+        else:
+            A.extend(B)
+            for k in B:
+                route_of[k] = ra
+            del routes[rb]
+        if len(routes) == 1:
+            break
+    tour = []
+    for r in routes.values():
+        tour.extend(r)
+    return tour
+
+def _two_opt(tour, D, deadline):
+    # closed tour through the depot (node 0); first-improvement segment reversal
+    t = [0] + tour + [0]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for a in range(1, len(t) - 2):
+            for b in range(a + 1, len(t) - 1):
+                delta = (D[t[a - 1], t[b]] + D[t[a], t[b + 1]]
+                         - D[t[a - 1], t[a]] - D[t[b], t[b + 1]])
+                if delta < 0:
+                    t[a:b + 1] = t[a:b + 1][::-1]
+                    improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return t[1:-1]
+
+def _or_opt(tour, D, deadline, max_seg=3):
+    # move segments of 1..max_seg goals to a better position in the closed tour
+    t = [0] + tour + [0]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for seg in range(1, max_seg + 1):
+            a = 1
+            while a + seg < len(t):
+                s0, s1 = t[a], t[a + seg - 1]
+                prev, nxt = t[a - 1], t[a + seg]
+                remove_gain = D[prev, s0] + D[s1, nxt] - D[prev, nxt]
+                rest = t[:a] + t[a + seg:]
+                best, best_pos, best_rev = 0, None, False
+                for p in range(len(rest) - 1):
+                    u, v = rest[p], rest[p + 1]
+                    fwd = D[u, s0] + D[s1, v] - D[u, v]
+                    rev = D[u, s1] + D[s0, v] - D[u, v]
+                    if fwd - remove_gain < best:
+                        best, best_pos, best_rev = fwd - remove_gain, p, False
+                    if rev - remove_gain < best:
+                        best, best_pos, best_rev = rev - remove_gain, p, True
+                if best_pos is not None:
+                    segment = t[a:a + seg]
+                    if best_rev:
+                        segment.reverse()
+                    t = rest[:best_pos + 1] + segment + rest[best_pos + 1:]
+                    improved = True
+                a += 1
+                if time.perf_counter() >= deadline:
+                    return t[1:-1]
+    return t[1:-1]
+
+def _split(tour, demand, D, capacity):
+    """
+    Optimal partition of the tour's item sequence into consecutive trips of at most
+    `capacity` items (Prins split). A goal's items may be spread over adjacent trips.
+    Returns trips as lists of [node, amount].
+    """
+    units = [g for g in tour for _ in range(demand[g])]
+    N = len(units)
+    best = [0.0] + [float('inf')] * N
+    pred = [0] * (N + 1)
+    for i in range(N):
+        if best[i] == float('inf'):
+            continue
+        cost = 0.0
+        cur = None
+        for j in range(i, min(N, i + capacity)):
+            g = units[j]
+            if cur is None:
+                cost = D[0, g]
+            elif g != cur:
+                cost += D[cur, g]
+            cur = g
+            total = best[i] + cost + D[g, 0]
+            if total < best[j + 1]:
+                best[j + 1] = total
+                pred[j + 1] = i
+    trips = []
+    j = N
+    while j > 0:
+        i = pred[j]
+        trip = []
+        for g in units[i:j]:
+            if trip and trip[-1][0] == g:
+                trip[-1][1] += 1
+            else:
+                trip.append([g, 1])
+        trips.append(trip)
+        j = i
+    trips.reverse()
+    return trips
+
+def _trip_cost(trip, D):
+    nodes = [0] + [g for g, _ in trip] + [0]
+    return sum(D[a, b] for a, b in zip(nodes[:-1], nodes[1:]))
+
+def _improve_trip(trip, D):
+    # exhaustive 2-opt on one short trip
+    improved = True
+    while improved:
+        improved = False
+        base = _trip_cost(trip, D)
+        for a in range(len(trip) - 1):
+            for b in range(a + 1, len(trip)):
+                cand = trip[:a] + trip[a:b + 1][::-1] + trip[b + 1:]
+                if _trip_cost(cand, D) < base:
+                    trip, improved = cand, True
+                    break
+            if improved:
+                break
+    return trip
+
+def plan_collection_routes(gw, carry_capacity=3, time_budget=2.0, goal_cells=None):
+    """
+    Near-optimal multi-trip collection schedule from gw.start.
+    goal_cells: {pos: items} (defaults to gw.goal_cells).
+    Returns a dict with
+    - start: the start / drop cell
+    - trips: list of trips, each a list of (goal_pos, items_picked)
+    - cost: total steps
+    - path: cell-level path (start ... start)
+    - pickups: (path index, goal index or -1 for the drop at start, amount) events;
+      as in SimpleMDPModel, items are also picked on goal cells the path only passes
+      through and dropped whenever it passes the start
+    - goal_positions / initial_goals: goal order and counts for plan_states
+    - capacity, step_cost / pick_reward / return_reward: the model plan_states scores with
+    Replay with animate_path(gw, **plan_replay_kwargs(plan)).
+    Raises ValueError when some goal cell cannot be reached from the start.
+    """
+    deadline = time.perf_counter() + time_budget
+    goal_cells = dict(gw.goal_cells if goal_cells is None else goal_cells)
+    D, maps = distance_matrix(gw.grid, [gw.start] + list(goal_cells.keys()))
+    unreachable = [g for g, d in zip(goal_cells, D[0, 1:]) if d < 0]
+    if unreachable:
+        raise ValueError(f"goal cells {unreachable} cannot be reached from start {gw.start}")
+    return _plan_from(gw, gw.start, goal_cells, D, maps, carry_capacity, deadline)
+
+def plan_routes_multi_start(gw, starts=None, carry_capacity=3, time_budget=2.0, goal_cells=None):
+    """
+    Collection plans from several candidate starts (default: gw.corners()) for about
+    the price of one: a single batched BFS gives the shared goal-to-goal matrix and
+    each start only adds its own row / column; the time budget is split between starts.
+    Starts on a goal cell or that cannot reach every goal are skipped (ValueError when
+    no start is left).
+    Returns the plans sorted by cost (best first); plan['start'] names the start.
+    """
+    goal_cells = dict(gw.goal_cells if goal_cells is None else goal_cells)
+    goal_positions = list(goal_cells.keys())
+    starts = [s for s in (gw.corners() if starts is None else starts)
+              if s not in goal_cells and gw.grid[s] != 1]
+    if not starts:
+        raise ValueError("no usable start cell (all candidates are goal cells or obstacles)")
+    S = len(starts)
+    Dall, maps = distance_matrix(gw.grid, starts + goal_positions)
+    goal_nodes = np.arange(S, S + len(goal_positions))
+    plans = []
+    for s, start in enumerate(starts):
+        if (Dall[s, goal_nodes] < 0).any():
+            continue
+        nodes = np.concatenate([[s], goal_nodes])
+        deadline = time.perf_counter() + time_budget / S
+        plans.append(_plan_from(gw, start, goal_cells, Dall[np.ix_(nodes, nodes)], maps[nodes],
+                                carry_capacity, deadline))
+    if not plans:
+        raise ValueError(f"no start among {starts} can reach every goal cell")
+    return sorted(plans, key=lambda p: p['cost'])
+
+def _plan_from(gw, start, goal_cells, D, maps, carry_capacity, deadline):
+    # D / maps over [start] + goals (node 0 = start)
+    demand = [0] + list(goal_cells.values())
+    active = [k for k in range(1, len(demand)) if demand[k] > 0]
+
+    if active:
+        sub = np.array([0] + active)
+        Dsub = D[np.ix_(sub, sub)]
+        tour = _savings_tour(Dsub)
+        tour = _two_opt(tour, Dsub, deadline)
+        tour = _or_opt(tour, Dsub, deadline)
+        tour = [int(sub[k]) for k in tour]
+    else:
+        tour = []
+    trips = [_improve_trip(t, D) for t in _split(tour, demand, D, carry_capacity)]
+    return trips_to_plan(gw, goal_cells, trips, maps, carry_capacity, start=start)
+
+def trips_to_plan(gw, goal_cells, trips, maps, carry_capacity, start=None,
+                  step_cost=-1.0, pick_reward=10.0, return_reward=20.0):
+    """
+    Expand trips over nodes (0 = start, k = k-th goal of goal_cells) into the plan dict
+    described in plan_collection_routes. Pickups / drops are recorded as events
+    instead of per-step goal tuples, following SimpleMDPModel along the whole path:
+    a leg through a goal cell with items left picks there, so a later stop may find
+    nothing to pick (it is skipped) and items it displaced are fetched by extra
+    nearest-goal trips at the end. 'trips' and 'cost' describe the path actually walked.
+    start defaults to gw.start.
+    """
+    start = gw.start if start is None else start
+    goal_positions = list(goal_cells.keys())
+    goal_index = {g: k for k, g in enumerate(goal_positions)}
+    points = [start] + goal_positions
+    path, pickups = [start], []
+    counts = [goal_cells[g] for g in goal_positions]
+    carried = 0
+
+    def walk(node):
+        # shortest leg, stepping around other goal cells with items left where it can
+        nonlocal carried
+        stocked = {g for g, n in zip(goal_positions, counts) if n > 0}
+        stocked.discard(points[node])
+        for pos in walk_downhill(maps[node], path[-1], stocked)[1:]:
+            path.append(pos)
+            k = goal_index.get(pos)
+            if k is not None and counts[k] > 0 and carried < carry_capacity:
+                amount = min(counts[k], carry_capacity - carried)
+                counts[k] -= amount
+                carried += amount
+                pickups.append((len(path) - 1, k, amount))
+            if pos == start and carried > 0:
+                pickups.append((len(path) - 1, -1, -carried))
+                carried = 0
+
+    for trip in trips:
+        for node, _ in trip:
+            if counts[node - 1] > 0 and carried < carry_capacity:
+                walk(node)
+        walk(0)
+    while any(counts):
+        while any(counts) and carried < carry_capacity:
+            walk(min((k for k, n in enumerate(counts) if n > 0),
+                     key=lambda k: maps[k + 1][path[-1]]) + 1)
+        walk(0)
+    walked, trip = [], []
+    for _, k, amount in pickups:
+        if k < 0:
+            walked.append(trip)
+            trip = []
+        else:
+            trip.append((goal_positions[k], amount))
+    return {
+        'start': start,
+        'trips': walked,
+        'cost': len(path) - 1,
+        'path': path,
+        'pickups': pickups,
+        'goal_positions': goal_positions,
+        'initial_goals': tuple(goal_cells[g] for g in goal_positions),
+        'capacity': carry_capacity,
+        'step_cost': step_cost,
+        'pick_reward': pick_reward,
+        'return_reward': return_reward,
+    }
+
+def plan_states(plan):
+    """
+    Lazily yield (state, reward) along plan['path'] with SimpleMDPModel-style states
+    (pos, carried, goals) and the plan's rewards; the first state has reward 0.
+    """
+    counts = list(plan['initial_goals'])
+    events = iter(plan['pickups'])
+    event = next(events, None)
+    carried = 0
+    for t, pos in enumerate(plan['path']):
+        reward = plan['step_cost'] if t else 0.0
+        while event is not None and event[0] == t:
+            _, goal, amount = event
+            if goal < 0:
+                reward += carried * plan['return_reward']
+                carried = 0
+            else:
+                counts[goal] -= amount
+                carried += amount
+                reward += amount * plan['pick_reward']
+            event = next(events, None)
+        yield (pos, carried, tuple(counts)), reward
+
+def plan_actions(plan):
+    """Lazily yield the (dr, dc) moves along plan['path'], e.g. to step them through an MDP model."""
+    path = plan['path']
+    for (r0, c0), (r1, c1) in zip(path, itertools.islice(path, 1, None)):
+        yield (r1 - r0, c1 - c0)
+
+def evaluate_plan(mdp, plan, gamma=1.0):
+    """
+    Step the plan's moves through mdp (a SimpleMDPModel over the same goals) from the
+    plan's start state. Returns (discounted return, final state).
+    """
+    state = (plan['start'], 0, tuple(plan['initial_goals']))
+    total, discount = 0.0, 1.0
+    for action in plan_actions(plan):
+        state, reward = mdp.step(state, action)
+        total += discount * reward
+        discount *= gamma
+    return total, state
+
+def plan_replay_kwargs(plan):
+    """Lazy keyword arguments for visualization.pygame_viz.animate_path."""
+    return dict(path=plan['path'],
+                rewards=(r for t, (_, r) in enumerate(plan_states(plan)) if t),
+                goal_history=(s[2] for s, _ in plan_states(plan)),
+                goal_positions=plan['goal_positions'])
@@ -0,0 +1,295 @@
+# planners/service.py
+"""
+Local asyncio planning service (Unix socket or localhost TCP, newline-delimited JSON).
+- grids are registered once ("load_grid") and cached by content hash; a default grid
+  can be given to the service and is used when a request names no grid
+- concurrent "path" / "distances" queries from the same source on the same grid
+  arriving within batch_window are coalesced into one one-to-many BFS
+- searches run in a process pool so bursts do not serialize on the event loop
+- "metrics" reports per-request latency and queue depth
+Requests:  {"id": 1, "op": "path", "start": [r, c], "goal": [r, c], "grid": id?}
+           {"id": 2, "op": "distances", "source": [r, c], "targets": [[r, c], ...]}
+           {"id": 3, "op": "load_grid", "grid": [[0, 1, ...], ...]}
+           {"id": 4, "op": "metrics"}
+Responses echo "id" and carry the result fields, or "error".
+Run `python -m planners.service` for a local burst demo.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .bfs import bfs_distances
+from .routing import walk_downhill
+
+def _search(grid, source, targets, want_path):
+    # one BFS from source answers every target: distances, plus source -> target
+    # paths only for the targets that asked for one (None otherwise)
+    dist = bfs_distances(grid, source)
+    out = []
+    for t, p in zip(targets, want_path):
+        d = int(dist[t])
+        out.append((d, (walk_downhill(dist, t)[::-1] if d >= 0 else []) if p else None))
+    return out
+
+def grid_id(grid):
+    grid = np.ascontiguousarray(grid, dtype=np.int8)
+    return hashlib.sha1(repr(grid.shape).encode() + grid.tobytes()).hexdigest()[:16]
+
+class PlanningService:
+    def __init__(self, grid=None, workers=None, batch_window=0.002, max_batch=256, latency_window=4096):
+        """
+        workers: process pool size (None = cpu count, 0 = the loop's default thread pool).
+        batch_window: seconds to wait for more queries from the same source.
+        """
+        self.grids = {}
+        self.default_grid = self.load_grid(grid) if grid is not None else None
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.server = None
+        self._pending = {}  # (grid id, source) -> [(target, wants path, future), ...]
+        self._connections = {}  # handler task -> writer
+        # metrics
+        self.latencies = deque(maxlen=latency_window)
+        self.requests = 0
+        self.queries = 0   # path / distances requests
+        self.searches = 0  # BFS runs answering them
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+
+    def load_grid(self, grid):
+        grid = np.ascontiguousarray(grid, dtype=np.int8)
+        key = grid_id(grid)
+        self.grids[key] = grid
+        return key
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """Listen on a Unix socket (path) or localhost TCP; returns the bound address."""
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=path)
+            return path
+        self.server = await asyncio.start_server(self._handle, host=host, port=port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # closing our side ends each handler's read loop, so handlers finish normally
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def metrics(self):
+        lat = np.array(self.latencies) * 1000.0
+        return {
+            'requests': self.requests,
+            'searches': self.searches,
+            'queries': self.queries,
+            'coalesced': self.queries - self.searches,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'latency_ms_mean': float(lat.mean()) if len(lat) else 0.0,
+            'latency_ms_p50': float(np.percentile(lat, 50)) if len(lat) else 0.0,
+            'latency_ms_p95': float(np.percentile(lat, 95)) if len(lat) else 0.0,
+            'latency_ms_max': float(lat.max()) if len(lat) else 0.0,
+        }
+
+    async def query(self, source, targets, grid=None, paths=True):
+        """
+        (distance, path) per target, from one (possibly shared) search.
+        With paths=False no path is reconstructed and path is None.
+        """
+        key = grid if grid is not None else self.default_grid
+        if key not in self.grids:
+            raise ValueError(f"unknown grid {key!r}; load_grid first")
+        R, C = self.grids[key].shape
+        # negative coordinates would wrap around in NumPy indexing
+        for cell in [source, *targets]:
+            if len(cell) != 2 or not all(isinstance(v, (int, np.integer)) for v in cell):
+                raise ValueError(f"cell {cell!r} is not a pair of integers")
+            r, c = cell
+            if not (0 <= r < R and 0 <= c < C):
+                raise ValueError(f"cell {(r, c)} outside the {R}x{C} grid")
+        self.queries += 1
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in targets]
+        batch_key = (key, tuple(source))
+        batch = self._pending.get(batch_key)
+        if batch is None:
+            batch = self._pending[batch_key] = []
+            loop.call_later(self.batch_window, self._flush, batch_key, batch)
+        batch.extend((tuple(t), paths, f) for t, f in zip(targets, futures))
+        if len(batch) >= self.max_batch:
+            self._flush(batch_key, batch)
+        return await asyncio.gather(*futures)
+
+    def _flush(self, batch_key, batch):
+        if self._pending.get(batch_key) is not batch:
+            return  # already flushed by max_batch
+        del self._pending[batch_key]
+        asyncio.ensure_future(self._run_batch(batch_key, batch))
+
+    async def _run_batch(self, batch_key, batch):
+        key, source = batch_key
+        want_path = {}
+        for t, p, _ in batch:
+            want_path[t] = want_path.get(t, False) or p
+        targets = list(want_path)
+        self.searches += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, _search, self.grids[key], source, targets, [want_path[t] for t in targets])
+        except Exception as e:
+            for _, _, f in batch:
+                if not f.done():
+                    f.set_exception(e)
+            return
+        by_target = dict(zip(targets, results))
+        for t, _, f in batch:
+            if not f.done():
+                f.set_result(by_target[t])
+
+    async def _dispatch(self, req):
+        op = req.get("op")
+        if op == "path":
+            (d, path), = await self.query(req["start"], [req["goal"]], req.get("grid"))
+            return {"path": [list(p) for p in path], "length": d}
+        if op == "distances":
+            res = await self.query(req["source"], req["targets"], req.get("grid"), paths=False)
+            return {"distances": [d for d, _ in res]}
+        if op == "load_grid":
+            return {"grid_id": self.load_grid(req["grid"])}
+        if op == "metrics":
+            return self.metrics()
+        raise ValueError(f"unknown op {op!r}")
+
+    async def _respond(self, req, writer):
+        t0 = time.perf_counter()
+        self.requests += 1
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            resp = await self._dispatch(req)
+        except Exception as e:
+            resp = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.queue_depth -= 1
+            self.latencies.append(time.perf_counter() - t0)
+        resp["id"] = req.get("id")
+        writer.write(json.dumps(resp).encode() + b"\n")
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        tasks = set()
+        me = asyncio.current_task()
+        self._connections[me] = writer
+        try:
+            while line := await reader.readline():
+                try:
+                    req = json.loads(line)
+                except ValueError as e:
+                    writer.write(json.dumps({"id": None, "error": f"bad request: {e}"}).encode() + b"\n")
+                    continue
+                # requests on one connection are served concurrently (pipelined)
+                task = asyncio.ensure_future(self._respond(req, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._connections.pop(me, None)
+            writer.close()
+
+class PlanningClient:
+    """Pipelined client: many requests may be in flight on one connection."""
+    def __init__(self):
+        self.reader = self.writer = None
+        self._next_id = 0
+        self._waiting = {}
+        self._reader_task = None
+
+    @classmethod
+    async def connect(cls, path=None, host="127.0.0.1", port=None):
+        self = cls()
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        return self
+
+    async def _read_loop(self):
+        while line := await self.reader.readline():
+            resp = json.loads(line)
+            f = self._waiting.pop(resp.pop("id"), None)
+            if f is None or f.done():
+                continue
+            if "error" in resp:
+                f.set_exception(RuntimeError(resp["error"]))
+            else:
+                f.set_result(resp)
+        for f in self._waiting.values():
+            if not f.done():
+                f.set_exception(ConnectionError("planning service closed the connection"))
+
+    async def request(self, op, **fields):
+        self._next_id += 1
+        f = asyncio.get_running_loop().create_future()
+        self._waiting[self._next_id] = f
+        self.writer.write(json.dumps({"id": self._next_id, "op": op, **fields}).encode() + b"\n")
+        await self.writer.drain()
+        return await f
+
+    async def path(self, start, goal, grid=None):
+        resp = await self.request("path", start=list(start), goal=list(goal), grid=grid)
+        return [tuple(p) for p in resp["path"]]
+
+    async def distances(self, source, targets, grid=None):
+        resp = await self.request("distances", source=list(source), targets=[list(t) for t in targets], grid=grid)
+        return resp["distances"]
+
+    async def load_grid(self, grid):
+        return (await self.request("load_grid", grid=np.asarray(grid).tolist()))["grid_id"]
+
+    async def metrics(self):
+        return await self.request("metrics")
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        if self._reader_task is not None:
+            await self._reader_task
+
+async def _demo(size=40, requests_per_goal=8):
+    # burst of start -> goal path queries from several clients on a cached grid
+    from env.gridworld import GridWorld
+    gw = GridWorld(size=size, num_goal_cells=20, obstacle_prob=0.12, seed=1)
+    async with PlanningService(gw.grid) as service:
+        host, port = await service.start()
+        clients = [await PlanningClient.connect(host=host, port=port) for _ in range(4)]
+        goals = list(gw.goal_cells)
+        t0 = time.perf_counter()
+        paths = await asyncio.gather(*(clients[k % len(clients)].path(gw.start, g)
+                                       for k, g in enumerate(goals * requests_per_goal)))
+        elapsed = time.perf_counter() - t0
+        print(f"{len(paths)} path queries in {elapsed*1000:.1f} ms, mean length {np.mean([len(p) for p in paths]):.1f}")
+        print(await clients[0].metrics())
+        for c in clients:
+            await c.close()
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
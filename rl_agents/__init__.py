@@ -1,7 +1,10 @@
 # rl_agents/__init__.py
 from .value_iteration import ValueIterationAgent
+from .chunked_value_iteration import ChunkedValueIterationAgent
 from .policy_iteration import PolicyIterationAgent
 from .q_learning import QLearningAgent
+from .linear_q import LinearQAgent
 from .sarsa import SarsaAgent
 from .td0 import TD0Agent
 from .td_lambda import TDLambdaAgent
+from .telemetry import TrainingTelemetry, EarlyStopping
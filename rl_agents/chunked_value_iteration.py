@@ -0,0 +1,106 @@
+# rl_agents/chunked_value_iteration.py
+"""
+Out-of-core Value Iteration over the indexed state space of mdp/mdp_model.py
+- V lives in a disk-backed float32 memmap (one value per state index)
+- states are processed in blocks of chunk_size indices with vectorized step_indices,
+  so memory is bounded by the chunk, not by the number of states
+- sweeps are in-place block by block (later blocks see earlier updates)
+"""
+import os
+import tempfile
+import numpy as np
+
+class IndexedTable:
+    """Read-only dict-like view (get / [] / in / len) of an array indexed by state_index."""
+    def __init__(self, mdp_model, values, decode=None):
+        self.mdp = mdp_model
+        self.values = values
+        self.decode = decode or float
+
+    def __getitem__(self, state):
+        return self.decode(self.values[self.mdp.state_index(state)])
+
+    def get(self, state, default=None):
+        try:
+            return self[state]
+        except (KeyError, IndexError):
+            return default
+
+    def __contains__(self, state):
+        return self.get(state) is not None
+
+    def __len__(self):
+        return len(self.values)
+
+class ChunkedValueIterationAgent:
+    def __init__(self, mdp_model, gamma=0.99, theta=1e-3, max_iters=1000, chunk_size=1 << 16, path=None):
+        self.mdp = mdp_model
+        self.gamma = gamma
+        self.theta = theta
+        self.max_iters = max_iters
+        self.chunk_size = chunk_size
+        # backing files: given path (kept) or a temporary file (removed by close())
+        self.path = path
+        self._tmp = []
+        self.V = None
+        self.pi = None
+
+    def _memmap(self, suffix, dtype, n):
+        path = self.path + suffix if self.path else None
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=suffix)
+            os.close(fd)
+            self._tmp.append(path)
+        return np.memmap(path, dtype=dtype, mode='w+', shape=(n,))
+
+    def _chunks(self, n):
+        for start in range(0, n, self.chunk_size):
+            yield start, min(n, start + self.chunk_size)
+
+    def value_iteration(self):
+        n = self.mdp.num_states()
+        terminal = self.mdp.terminal_index()
+        self.V = self._memmap('.V.f32', np.float32, n)
+        self.V[:] = 0.0
+        for it in range(self.max_iters):
+            delta = 0.0
+            for start, end in self._chunks(n):
+                idx = np.arange(start, end, dtype=np.int64)
+                best = np.full(end - start, -np.inf)
+                for a in range(len(self.mdp.actions)):
+                    nxt, reward = self.mdp.step_indices(idx, a)
+                    np.maximum(best, reward + self.gamma * self.V[nxt], out=best)
+                best[idx == terminal] = 0.0
+                delta = max(delta, float(np.abs(best - self.V[start:end]).max()))
+                self.V[start:end] = best
+            if delta < self.theta:
+                break
+        self.V.flush()
+
+    def extract_policy(self):
+        n = self.mdp.num_states()
+        self.pi = self._memmap('.pi.i8', np.int8, n)
+        for start, end in self._chunks(n):
+            idx = np.arange(start, end, dtype=np.int64)
+            q = np.empty((len(self.mdp.actions), end - start))
+            for a in range(len(self.mdp.actions)):
+                nxt, reward = self.mdp.step_indices(idx, a)
+                q[a] = reward + self.gamma * self.V[nxt]
+            self.pi[start:end] = q.argmax(axis=0)
+        self.pi[self.mdp.terminal_index()] = self.mdp.actions.index((0,0))
+        self.pi.flush()
+
+    def run(self, start_state, max_steps=10000):
+        self.value_iteration()
+        self.extract_policy()
+        actions = self.mdp.actions
+        return (IndexedTable(self.mdp, self.pi, decode=lambda a: actions[int(a)]),
+                IndexedTable(self.mdp, self.V))
+
+    def close(self):
+        # drop the memmaps and delete temporary backing files
+        self.V = self.pi = None
+        for path in self._tmp:
+            if os.path.exists(path):
+                os.remove(path)
+        self._tmp = []
@@ -0,0 +1,155 @@
+# rl_agents/linear_q.py
+"""
+Semi-gradient Q-learning / SARSA with a linear function approximator.
+Q(s,a) = w . phi(s,a), where phi is built from the afterstate of the move:
+- bias, "return to start" mode flag and distance-to-target features
+  (BFS distance maps from planners, normalized by grid size)
+- items the move picks up / drops off
+- optional coarse position tiles of the afterstate (separately per mode), one-hot of carried
+- remaining-items mask and remaining fraction per goal
+Memory is O(features) regardless of the number of goal cells; updates are
+applied in batches of transitions with NumPy.
+"""
+import random
+import numpy as np
+from planners import bfs_distances
+
+class LinearPolicy:
+    """Greedy policy of a LinearQAgent, usable as pi.get(state) or as a callable."""
+    def __init__(self, agent):
+        self.agent = agent
+
+    def __getitem__(self, state):
+        return self.agent.greedy_action(state)
+
+    def get(self, state, default=None):
+        try:
+            return self[state]
+        except KeyError:
+            return default
+
+    def __call__(self, state):
+        return self[state]
+
+class LinearQAgent:
+    def __init__(self, mdp_model, alpha=0.01, gamma=0.99, epsilon=0.1, episodes=2000, max_steps=500,
+                 batch_size=32, method='q', tile_size=0):
+        self.mdp = mdp_model
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.episodes = episodes
+        self.max_steps = max_steps
+        self.batch_size = batch_size
+        self.method = method  # 'q' (off-policy max target) or 'sarsa'
+        # side of square position tiles; 0 disables them (per-cell one-hots with
+        # tile_size=1 alias pick/return values across goal configurations)
+        self.tile_size = tile_size
+        self._build_features()
+        self.w = np.zeros(self.num_features)
+
+    def _build_features(self):
+        mdp = self.mdp
+        # position index, next-position and goal/start lookups are the model's compiled tables
+        mdp._build_index()
+        positions = mdp._positions
+        self._pos_index = mdp._pos_index
+        self._next_pos = mdp._next_pos
+        self._goal_at = mdp._goal_at
+        self._start_index = mdp._start_index
+        n = len(positions)
+        rows = np.array([p[0] for p in positions])
+        cols = np.array([p[1] for p in positions])
+        scale = float(2 * mdp.size)
+        self._d_start = bfs_distances(mdp.gw.grid, mdp.start)[rows, cols] / scale
+        if mdp.goal_positions:
+            self._d_goal = np.stack([bfs_distances(mdp.gw.grid, g)[rows, cols] for g in mdp.goal_positions]) / scale
+        else:
+            self._d_goal = np.zeros((0, n))
+        self._goal_initial = np.array(mdp.goal_initial, dtype=float)
+        G = len(mdp.goal_positions)
+        # layout: [bias, return_mode, d_start|return, d_goal|collect, d_start*load, pick, drop,
+        #          tile|collect(T), tile|return(T), carried(cap+1), mask(G), frac(G)]
+        if self.tile_size:
+            tiles_per_row = -(-mdp.size // self.tile_size)
+            self._tile = (rows // self.tile_size) * tiles_per_row + cols // self.tile_size
+            self._num_tiles = tiles_per_row * tiles_per_row
+        else:
+            self._tile = None
+            self._num_tiles = 0
+        self._pos_off = 7
+        self._carry_off = self._pos_off + 2 * self._num_tiles
+        self._mask_off = self._carry_off + mdp.capacity + 1
+        self._frac_off = self._mask_off + G
+        self.num_features = self._frac_off + G
+
+    def features(self, state):
+        """phi(s, a) for every action: array of shape (len(actions), num_features)."""
+        pos, carried, goals = state
+        nxt = self._next_pos[self._pos_index[pos]]
+        goals = np.asarray(goals, dtype=float)
+        remaining = goals > 0
+        return_mode = float(carried >= self.mdp.capacity or not remaining.any())
+        phi = np.zeros((len(nxt), self.num_features))
+        phi[:, 0] = 1.0
+        phi[:, 1] = return_mode
+        phi[:, 2] = return_mode * self._d_start[nxt]
+        if remaining.any():
+            phi[:, 3] = (1.0 - return_mode) * self._d_goal[remaining][:, nxt].min(axis=0)
+        load = carried / max(self.mdp.capacity, 1)
+        phi[:, 4] = self._d_start[nxt] * load
+        # items picked up / dropped off by the move itself (normalized by capacity)
+        k = self._goal_at[nxt]
+        count = np.where(k >= 0, goals[np.maximum(k, 0)] if len(goals) else 0.0, 0.0)
+        phi[:, 5] = np.minimum(count, self.mdp.capacity - carried) / max(self.mdp.capacity, 1)
+        phi[:, 6] = (nxt == self._start_index) * load
+        if self._tile is not None:
+            phi[np.arange(len(nxt)), self._pos_off + self._tile[nxt] + int(return_mode) * self._num_tiles] = 1.0
+        phi[:, self._carry_off + carried] = 1.0
+        phi[:, self._mask_off:self._frac_off] = remaining
+        if len(goals):
+            phi[:, self._frac_off:] = goals / np.maximum(self._goal_initial, 1.0)
+        return phi
+
+    def greedy_action(self, state):
+        return self.mdp.actions[int(np.argmax(self.features(state) @ self.w))]
+
+    def _choose(self, phi):
+        if random.random() < self.epsilon:
+            return random.randrange(len(self.mdp.actions))
+        return int(np.argmax(phi @ self.w))
+
+    def _update(self, phi_sa, rewards, phi_next, a_next, done):
+        # one semi-gradient step on a batch of transitions
+        phi_sa = np.asarray(phi_sa)
+        q_next = np.asarray(phi_next) @ self.w  # (B, A)
+        if self.method == 'sarsa':
+            bootstrap = q_next[np.arange(len(a_next)), a_next]
+        else:
+            bootstrap = q_next.max(axis=1)
+        target = np.asarray(rewards) + self.gamma * bootstrap * (1.0 - np.asarray(done, dtype=float))
+        err = target - phi_sa @ self.w
+        self.w += self.alpha / len(err) * (err @ phi_sa)
+
+    def run(self, start_state):
+        batch = ([], [], [], [], [])
+        for ep in range(self.episodes):
+            state = start_state
+            phi = self.features(state)
+            a = self._choose(phi)
+            for t in range(self.max_steps):
+                ns, r = self.mdp.step(state, self.mdp.actions[a])
+                done = self.mdp.is_terminal(ns)
+                phi2 = self.features(ns)
+                a2 = self._choose(phi2)
+                for buf, item in zip(batch, (phi[a], r, phi2, a2, done)):
+                    buf.append(item)
+                if len(batch[0]) >= self.batch_size:
+                    self._update(*batch)
+                    batch = ([], [], [], [], [])
+                state, phi, a = ns, phi2, a2
+                if done:
+                    break
+        if batch[0]:
+            self._update(*batch)
+        return LinearPolicy(self), self.w
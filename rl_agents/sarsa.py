@@ -1,9 +1,11 @@
 # rl_agents/sarsa.py
 import random
 from collections import defaultdict
+from .telemetry import end_episode, greedy_return
 
 class SarsaAgent:
-    def __init__(self, mdp_model, alpha=0.5, gamma=0.99, epsilon=0.1, episodes=2000, max_steps=500):
+    def __init__(self, mdp_model, alpha=0.5, gamma=0.99, epsilon=0.1, episodes=2000, max_steps=500,
+                 telemetry=None, early_stopping=None):
         self.mdp = mdp_model
         self.alpha = alpha
         self.gamma = gamma
@@ -11,6 +13,10 @@ class SarsaAgent:
         self.episodes = episodes
         self.max_steps = max_steps
         self.Q = defaultdict(lambda: {a:0.0 for a in self.mdp.actions})
+        # optional TrainingTelemetry / EarlyStopping (rl_agents.telemetry)
+        self.telemetry = telemetry
+        self.early_stopping = early_stopping
+        self.episodes_run = 0
 
     def choose_action(self, state):
         import random
@@ -20,17 +26,31 @@ class SarsaAgent:
             qvals = self.Q[state]
             return max(qvals.items(), key=lambda kv: kv[1])[0]
 
+    def greedy_action(self, state):
+        qvals = self.Q.get(state)
+        return max(qvals.items(), key=lambda kv: kv[1])[0] if qvals else None
+
     def run(self, start_state):
         for ep in range(self.episodes):
             state = start_state
             a = self.choose_action(state)
+            ret, max_delta = 0.0, 0.0
             for t in range(self.max_steps):
                 ns, r = self.mdp.step(state, a)
                 a2 = self.choose_action(ns)
-                self.Q[state][a] += self.alpha * (r + self.gamma * self.Q[ns][a2] - self.Q[state][a])
+                delta = self.alpha * (r + self.gamma * self.Q[ns][a2] - self.Q[state][a])
+                self.Q[state][a] += delta
+                ret += r
+                max_delta = max(max_delta, abs(delta))
                 state, a = ns, a2
                 if self.mdp.is_terminal(state):
                     break
+            self.episodes_run = ep + 1
+            if end_episode(self.telemetry, self.early_stopping, ep, ret, t + 1, self.epsilon, max_delta,
+                           lambda: greedy_return(self.mdp, self.greedy_action, start_state, self.max_steps)):
+                break
+        if self.telemetry is not None:
+            self.telemetry.flush()
         pi = {}
         for s, actions in self.Q.items():
             best = max(actions.items(), key=lambda kv: kv[1])[0]
@@ -2,11 +2,14 @@
 """
 TD(0) learning for state-value function (on-policy) using random policy or given policy
 """
+import math
 import random
 from collections import defaultdict
+from .telemetry import end_episode, greedy_return, lookahead_policy
 
 class TD0Agent:
-    def __init__(self, mdp_model, alpha=0.1, gamma=0.99, episodes=1000, max_steps=500, policy=None):
+    def __init__(self, mdp_model, alpha=0.1, gamma=0.99, episodes=1000, max_steps=500, policy=None,
+                 telemetry=None, early_stopping=None):
         self.mdp = mdp_model
         self.alpha = alpha
         self.gamma = gamma
@@ -15,15 +18,31 @@ class TD0Agent:
         # policy: function mapping state -> action
         self.policy = policy or (lambda s: random.choice(self.mdp.actions))
         self.V = defaultdict(float)
+        # optional TrainingTelemetry / EarlyStopping (rl_agents.telemetry); the greedy
+        # return is measured with a one-step lookahead on V
+        self.telemetry = telemetry
+        self.early_stopping = early_stopping
+        self.episodes_run = 0
 
     def run(self, start_state):
         for ep in range(self.episodes):
             state = start_state
+            ret, max_delta = 0.0, 0.0
             for t in range(self.max_steps):
                 a = self.policy(state)
                 ns, r = self.mdp.step(state, a)
-                self.V[state] += self.alpha * (r + self.gamma * self.V[ns] - self.V[state])
+                delta = self.alpha * (r + self.gamma * self.V[ns] - self.V[state])
+                self.V[state] += delta
+                ret += r
+                max_delta = max(max_delta, abs(delta))
                 state = ns
                 if self.mdp.is_terminal(state):
                     break
+            self.episodes_run = ep + 1
+            if end_episode(self.telemetry, self.early_stopping, ep, ret, t + 1, math.nan, max_delta,
+                           lambda: greedy_return(self.mdp, lookahead_policy(self.mdp, self.V, self.gamma),
+                                                 start_state, self.max_steps)):
+                break
+        if self.telemetry is not None:
+            self.telemetry.flush()
         return self.policy, self.V
@@ -3,10 +3,13 @@
 TD(lambda) for state-values using eligibility traces (accumulating)
 """
 from collections import defaultdict
+import math
 import random
+from .telemetry import end_episode, greedy_return, lookahead_policy
 
 class TDLambdaAgent:
-    def __init__(self, mdp_model, alpha=0.1, gamma=0.99, lam=0.8, episodes=1000, max_steps=500, policy=None):
+    def __init__(self, mdp_model, alpha=0.1, gamma=0.99, lam=0.8, episodes=1000, max_steps=500, policy=None,
+                 telemetry=None, early_stopping=None):
         self.mdp = mdp_model
         self.alpha = alpha
         self.gamma = gamma
@@ -15,12 +18,18 @@ class TDLambdaAgent:
         self.max_steps = max_steps
         self.policy = policy or (lambda s: random.choice(self.mdp.actions))
         self.V = defaultdict(float)
+        # optional TrainingTelemetry / EarlyStopping (rl_agents.telemetry); the greedy
+        # return is measured with a one-step lookahead on V
+        self.telemetry = telemetry
+        self.early_stopping = early_stopping
+        self.episodes_run = 0
 
     def run(self, start_state):
         for ep in range(self.episodes):
             # eligibility traces
             E = defaultdict(float)
             state = start_state
+            ret, max_delta = 0.0, 0.0
             for t in range(self.max_steps):
                 a = self.policy(state)
                 ns, r = self.mdp.step(state, a)
@@ -29,7 +38,16 @@ class TDLambdaAgent:
                 for s in list(E.keys()):
                     self.V[s] += self.alpha * delta * E[s]
                     E[s] = self.gamma * self.lam * E[s]
+                ret += r
+                max_delta = max(max_delta, abs(self.alpha * delta))
                 state = ns
                 if self.mdp.is_terminal(state):
                     break
+            self.episodes_run = ep + 1
+            if end_episode(self.telemetry, self.early_stopping, ep, ret, t + 1, math.nan, max_delta,
+                           lambda: greedy_return(self.mdp, lookahead_policy(self.mdp, self.V, self.gamma),
+                                                 start_state, self.max_steps)):
+                break
+        if self.telemetry is not None:
+            self.telemetry.flush()
         return self.policy, self.V
@@ -0,0 +1,154 @@
+# rl_agents/telemetry.py
+"""
+Training telemetry and early stopping for the learning agents.
+- TrainingTelemetry: per-episode stats (return, length, epsilon, largest value
+  change, greedy return) buffered in preallocated NumPy arrays and flushed in
+  batches to a JSONL or CSV file (or kept in memory when no path is given)
+- EarlyStopping: stops when the greedy return from the start state has not
+  improved by min_delta for `patience` evaluations
+- greedy_return: return of one greedy rollout (the MDP is deterministic);
+  lookahead_policy gives the greedy policy of a state-value table
+"""
+import csv
+import json
+import math
+import os
+import time
+import numpy as np
+
+FIELDS = ('episode', 'return', 'length', 'epsilon', 'max_delta', 'greedy_return', 'elapsed')
+_DTYPES = (np.int64, np.float64, np.int64, np.float64, np.float64, np.float64, np.float64)
+
+class TrainingTelemetry:
+    def __init__(self, path=None, fmt=None, flush_every=256):
+        """
+        path: output file (appended to), None = keep rows in memory.
+        fmt: 'jsonl' or 'csv', inferred from the file suffix by default.
+        """
+        self.path = path
+        self.fmt = fmt or ('csv' if path and str(path).endswith('.csv') else 'jsonl')
+        self.flush_every = flush_every
+        self._buf = {f: np.empty(flush_every, dtype=d) for f, d in zip(FIELDS, _DTYPES)}
+        self._n = 0
+        self._chunks = []  # in-memory mode: flushed copies of the buffer
+        # appending to an existing CSV: its header is already there
+        self._header_written = bool(path) and os.path.exists(path) and os.path.getsize(path) > 0
+        self._t0 = time.perf_counter()
+        self.count = 0
+
+    def record(self, episode, ret, length, epsilon=math.nan, max_delta=math.nan, greedy_return=math.nan):
+        b, i = self._buf, self._n
+        b['episode'][i] = episode
+        b['return'][i] = ret
+        b['length'][i] = length
+        b['epsilon'][i] = epsilon
+        b['max_delta'][i] = max_delta
+        b['greedy_return'][i] = greedy_return
+        b['elapsed'][i] = time.perf_counter() - self._t0
+        self._n += 1
+        self.count += 1
+        if self._n == self.flush_every:
+            self.flush()
+
+    def flush(self):
+        n = self._n
+        if n == 0:
+            return
+        self._n = 0
+        if self.path is None:
+            self._chunks.append({f: self._buf[f][:n].copy() for f in FIELDS})
+            return
+        columns = [self._buf[f][:n].tolist() for f in FIELDS]
+        with open(self.path, 'a', newline='', encoding='utf-8') as fh:
+            if self.fmt == 'csv':
+                w = csv.writer(fh)
+                if not self._header_written:
+                    w.writerow(FIELDS)
+                    self._header_written = True
+                w.writerows(zip(*columns))
+            else:
+                # NaN (not measured) becomes null
+                fh.writelines(json.dumps({f: (None if isinstance(v, float) and math.isnan(v) else v)
+                                          for f, v in zip(FIELDS, row)}) + '\n'
+                              for row in zip(*columns))
+
+    def arrays(self):
+        """All rows recorded in memory mode (flushes the buffer first): {field: array}."""
+        self.flush()
+        if not self._chunks:
+            return {f: np.empty(0, dtype=d) for f, d in zip(FIELDS, _DTYPES)}
+        return {f: np.concatenate([c[f] for c in self._chunks]) for f in FIELDS}
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class EarlyStopping:
+    def __init__(self, patience=20, min_delta=1e-3, eval_every=10):
+        """Evaluate the greedy policy every eval_every episodes; stop after patience evaluations without improvement."""
+        self.patience = patience
+        self.min_delta = min_delta
+        self.eval_every = eval_every
+        self.best = -math.inf
+        self.wait = 0
+        self.stopped_episode = None
+
+    def due(self, episode):
+        return (episode + 1) % self.eval_every == 0
+
+    def update(self, value, episode=None):
+        """Returns True when training should stop."""
+        if value > self.best + self.min_delta:
+            self.best = value
+            self.wait = 0
+            return False
+        self.wait += 1
+        if self.wait >= self.patience:
+            self.stopped_episode = episode
+            return True
+        return False
+
+def greedy_return(mdp, policy, start_state, max_steps=500):
+    """Undiscounted return of following policy (state -> action or None) from start_state."""
+    state, total = start_state, 0.0
+    for _ in range(max_steps):
+        if mdp.is_terminal(state):
+            break
+        a = policy(state)
+        if a is None:
+            break
+        state, r = mdp.step(state, a)
+        total += r
+    return total
+
+def lookahead_policy(mdp, V, gamma):
+    """Greedy policy of a state-value table via one-step lookahead through the model."""
+    def policy(state):
+        best, best_v = None, -math.inf
+        for a in mdp.actions:
+            ns, r = mdp.step(state, a)
+            v = r + gamma * V.get(ns, 0.0)
+            if v > best_v:
+                best, best_v = a, v
+        return best
+    return policy
+
+def end_episode(telemetry, early_stopping, episode, ret, length, epsilon, max_delta, evaluate):
+    """
+    Shared end-of-episode hook of the learning agents: records telemetry and, when
+    an evaluation is due, computes evaluate() (the greedy return). Returns True to stop.
+    """
+    greedy, stop = math.nan, False
+    if early_stopping is not None and early_stopping.due(episode):
+        greedy = evaluate()
+        stop = early_stopping.update(greedy, episode)
+    if telemetry is not None:
+        telemetry.record(episode, ret, length, epsilon, max_delta, greedy)
+        if stop:
+            telemetry.flush()
+    return stop
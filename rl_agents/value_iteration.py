@@ -2,18 +2,53 @@
 """
 Tabular Value Iteration over a small MDP built from mdp/mdp_model.py
 Note: This is a simplistic implementation for demonstration.
+Supports warm starting from a value function (or policy) solved on a nearby model:
+mapped values seed V and only states with a Bellman residual are re-converged,
+highest residual first.
+Modes (all stop when no value changes by theta or more):
+- 'sync': in-place sweeps in get_all_states() order
+- 'gauss_seidel': vectorized sweeps over the indexed model (step_indices), states
+  ordered by backward BFS distance to the terminal state; each distance level is
+  one block, so values flow from the terminal outwards within a single sweep, and
+  only states with a changed successor are backed up again
+- 'prioritized': prioritized sweeping from V = 0 (see prioritized_iteration)
 """
+import heapq
 import math
 from collections import defaultdict
+import numpy as np
+
+MODES = ('sync', 'gauss_seidel', 'prioritized')
+# Policy-evaluation sweeps when warm starting from a saved policy: enough to seed V
+# along the policy's paths; prioritized_iteration does the rest of the convergence.
+WARM_START_EVAL_SWEEPS = 5
 
 class ValueIterationAgent:
-    def __init__(self, mdp_model, gamma=0.99, theta=1e-3, max_iters=5000):
+    def __init__(self, mdp_model, gamma=0.99, theta=1e-3, max_iters=5000, mode='sync'):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}, expected one of {MODES}")
         self.mdp = mdp_model
+        self.mode = mode
         self.gamma = gamma
         self.theta = theta
         self.max_iters = max_iters
         self.V = defaultdict(float)  # Initialize values to 0
         self.pi = {}
+        self.warm_started = False
+        self.backups = 0  # number of Bellman backups performed
+        self.sweeps = 0
+
+    def _backup(self, state):
+        # Best one-step lookahead value and action for a state
+        max_v = float('-inf')
+        best_action = None
+        for action in self.mdp.actions:
+            next_state, reward = self.mdp.step(state, action)
+            v = reward + self.gamma * self.V[next_state]
+            if v > max_v:
+                max_v = v
+                best_action = action
+        return max_v, best_action
 
     def value_iteration(self):
         iteration = 0
@@ -37,14 +72,173 @@ class ValueIterationAgent:
                 
                 # Update value
                 self.V[state] = max_v
+                self.backups += 1
                 delta = max(delta, abs(old_v - self.V[state]))
             
+            self.sweeps += 1
             # Check convergence
             if delta < self.theta:
                 break
                 
             iteration += 1
 
+    def _terminal_order(self, nxt, terminal):
+        # Backward BFS over the transition arrays: distance (in steps) from every state
+        # to the terminal state. States that cannot reach it come last.
+        n = nxt.shape[1]
+        dist = np.full(n, -1, dtype=np.int64)
+        dist[terminal] = 0
+        frontier = np.zeros(n, dtype=bool)
+        frontier[terminal] = True
+        d = 0
+        while frontier.any():
+            d += 1
+            frontier = frontier[nxt].any(axis=0) & (dist < 0)
+            dist[frontier] = d
+        dist[dist < 0] = d
+        order = np.argsort(dist, kind='stable')
+        bounds = np.searchsorted(dist[order], np.arange(d + 2))
+        return order, bounds
+
+    def gauss_seidel(self):
+        """
+        Vectorized Gauss-Seidel value iteration. Transitions of every (action, state)
+        come from mdp.step_indices once; states are relabelled in backward-BFS order
+        from the terminal state so each distance level is a contiguous block, backed
+        up at once (Jacobi inside a block, Gauss-Seidel across blocks).
+        A reverse-transition index (CSR) marks the predecessors of every changed state;
+        only marked states are backed up, since the others have a zero residual.
+        Returns (V, pi) as arrays indexed by state_index; pi holds action indices.
+        """
+        n = self.mdp.num_states()
+        A = len(self.mdp.actions)
+        terminal = self.mdp.terminal_index()
+        idx = np.arange(n, dtype=np.int64)
+        nxt = np.empty((A, n), dtype=np.int64)
+        rew = np.empty((A, n))
+        for a in range(A):
+            nxt[a], rew[a] = self.mdp.step_indices(idx, a)
+        order, bounds = self._terminal_order(nxt, terminal)
+        # relabel: position of each state in the sweep order
+        pos = np.empty(n, dtype=np.int64)
+        pos[order] = idx
+        nxt = pos[nxt[:, order]]
+        rew = rew[:, order]
+        # predecessors of j: pred_src[pred_ptr[j]:pred_ptr[j+1]]
+        flat = nxt.ravel()
+        by_target = np.argsort(flat, kind='stable')
+        pred_src = by_target % n
+        pred_ptr = np.searchsorted(flat[by_target], np.arange(n + 1))
+        del flat, by_target, idx
+        blocks = [(int(lo), int(hi)) for lo, hi in zip(bounds[1:-1], bounds[2:]) if hi > lo]  # level 0 is the terminal
+        V = np.zeros(n)
+        dirty = np.ones(n, dtype=bool)
+        dirty[0] = False  # the terminal state (first in the order) keeps V = 0
+        for _ in range(self.max_iters):
+            delta = 0.0
+            for lo, hi in blocks:
+                sel = lo + np.flatnonzero(dirty[lo:hi])
+                if len(sel) == 0:
+                    continue
+                dirty[sel] = False
+                best = (rew[:, sel] + self.gamma * V[nxt[:, sel]]).max(axis=0)
+                change = np.abs(best - V[sel])
+                V[sel] = best
+                self.backups += len(sel)
+                delta = max(delta, float(change.max()))
+                changed = sel[change > 0]
+                if len(changed):
+                    starts, ends = pred_ptr[changed], pred_ptr[changed + 1]
+                    lengths = ends - starts
+                    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+                    dirty[pred_src[offsets + np.arange(lengths.sum())]] = True
+                    dirty[0] = False
+            self.sweeps += 1
+            if delta < self.theta or not dirty.any():
+                break
+        pi = np.empty(n, dtype=np.int64)
+        pi[order] = (rew + self.gamma * V[nxt]).argmax(axis=0)
+        pi[terminal] = self.mdp.actions.index((0,0))
+        return V[pos], pi
+
+    def warm_start(self, prev_V=None, prev_mdp=None, prev_pi=None):
+        """
+        Seed V from a previous solve of a nearby model (obstacle added, goal moved,
+        items_per_goal changed). States are translated with SimpleMDPModel.map_state;
+        states without a counterpart start at 0. If only a saved policy is given,
+        a few policy-evaluation sweeps on this model give the seed values.
+        """
+        prev_mdp = prev_mdp or self.mdp
+        self.V = defaultdict(float)
+        if prev_V is not None:
+            for s, v in prev_V.items():
+                ns = self.mdp.map_state(s, prev_mdp)
+                if ns is not None:
+                    self.V[ns] = v
+        elif prev_pi is not None:
+            policy = {}
+            for s, a in prev_pi.items():
+                ns = self.mdp.map_state(s, prev_mdp)
+                if ns is not None:
+                    policy[ns] = a
+            self._evaluate_policy(policy, WARM_START_EVAL_SWEEPS)
+        self.warm_started = True
+
+    def _evaluate_policy(self, policy, sweeps):
+        # In-place policy evaluation, at most `sweeps` sweeps; one model step per state per sweep.
+        # A policy that loops never reaches theta, so full evaluation can take thousands of sweeps.
+        for _ in range(sweeps):
+            delta = 0
+            for state, action in policy.items():
+                if self.mdp.is_terminal(state):
+                    continue
+                next_state, reward = self.mdp.step(state, action)
+                old_v = self.V[state]
+                self.V[state] = reward + self.gamma * self.V[next_state]
+                delta = max(delta, abs(old_v - self.V[state]))
+            if delta < self.theta:
+                break
+
+    def prioritized_iteration(self):
+        """
+        Re-converge from the current V. One pass computes every state's Bellman
+        residual and a reverse-transition index; afterwards states are backed up
+        from a max-heap on residual and predecessors are queued once the
+        accumulated change of their successors exceeds theta.
+        """
+        preds = defaultdict(set)
+        heap = []
+        for state in self.mdp.get_all_states():
+            if self.mdp.is_terminal(state):
+                continue
+            max_v = float('-inf')
+            for action in self.mdp.actions:
+                next_state, reward = self.mdp.step(state, action)
+                preds[next_state].add(state)
+                max_v = max(max_v, reward + self.gamma * self.V[next_state])
+            residual = abs(max_v - self.V[state])
+            if residual > self.theta:
+                heapq.heappush(heap, (-residual, state))
+
+        pending = defaultdict(float)
+        budget = self.max_iters * max(len(preds), 1)
+        while heap and self.backups < budget:
+            _, state = heapq.heappop(heap)
+            pending.pop(state, None)
+            old_v = self.V[state]
+            self.V[state], _ = self._backup(state)
+            self.backups += 1
+            change = abs(self.V[state] - old_v)
+            if change <= 0:
+                continue
+            for p in preds.get(state, ()):
+                if self.mdp.is_terminal(p):
+                    continue
+                pending[p] += self.gamma * change
+                if pending[p] > self.theta:
+                    heapq.heappush(heap, (-pending[p], p))
+                    pending[p] = 0.0
+
     def extract_policy(self):
         # Extract optimal policy from value function
         for state in self.mdp.get_all_states():
@@ -53,19 +247,23 @@ class ValueIterationAgent:
                 continue
                 
             # Find action that maximizes value
-            max_v = float('-inf')
-            best_action = None
-            
-            for action in self.mdp.actions:
-                next_state, reward = self.mdp.step(state, action)
-                v = reward + self.gamma * self.V[next_state]
-                if v > max_v:
-                    max_v = v
-                    best_action = action
-                    
+            _, best_action = self._backup(state)
             self.pi[state] = best_action
 
     def run(self, start_state, max_steps=10000):
-        self.value_iteration()
+        if self.warm_started:
+            self.prioritized_iteration()
+        elif self.mode == 'gauss_seidel':
+            V, pi = self.gauss_seidel()
+            # same dict tables as the other modes (get_all_states() follows state_index order)
+            states = list(self.mdp.get_all_states())
+            self.V = defaultdict(float, zip(states, V.tolist()))
+            self.pi = {s: self.mdp.actions[a] for s, a in zip(states, pi.tolist())}
+            return self.pi, self.V
+        elif self.mode == 'prioritized':
+            self.V = defaultdict(float)
+            self.prioritized_iteration()
+        else:
+            self.value_iteration()
         self.extract_policy()
         return self.pi, self.V
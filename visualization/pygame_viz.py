@@ -1,13 +1,26 @@
 """
 Simple Pygame visualization for grid and a given path (list of positions).
 Call draw_run(gridworld, paths_list, start) where paths_list is list of waypoints to animate.
+
+GridRenderer keeps the static layout on a cached background surface and per frame
+only redraws the cells that changed (old/new robot cell, goal counts, new path marker)
+plus the info panel; text is built from cached glyphs. With headless=True it renders
+offscreen through the SDL dummy driver and frames can be exported as NumPy arrays,
+a PNG sequence or a GIF (GIF needs Pillow).
 """
+import os
 import pygame
 import sys
 import time
 
 CELL = 40
 MARGIN = 2
+INFO_LINE = 18
+INFO_LINES = 5
+# goal item counts are drawn at this fraction of the cell size, and hidden when
+# that would be smaller than MIN_COUNT_FONT pixels
+COUNT_FONT_SCALE = 0.6
+MIN_COUNT_FONT = 10
 COLORS = {
     'bg': (30,30,30),
     'empty': (220,220,220),
@@ -19,132 +32,266 @@ COLORS = {
     'text': (240,240,240)
 }
 
-def draw_grid(surface, gw, cellsize):
-    rows, cols = gw.grid.shape
-    font = pygame.font.SysFont(None, 24)  # Font for item counts
-
-    for r in range(rows):
-        for c in range(cols):
-            x = c * (cellsize + MARGIN) + MARGIN
-            y = r * (cellsize + MARGIN) + MARGIN
-            rect = pygame.Rect(x, y, cellsize, cellsize)
-
-            if gw.grid[r,c] == 1:
-                color = COLORS['obstacle']
-            elif (r,c) == gw.start:
-                color = COLORS['start']
-            elif (r,c) in gw.goal_cells:
-                if gw.goal_cells[(r,c)] > 0:
-                    color = COLORS['goal']
-                    # Draw number of remaining items
-                    items = str(gw.goal_cells[(r,c)])
-                    text = font.render(items, True, COLORS['text'])
-                    text_rect = text.get_rect(center=rect.center)
+_fonts = {}
+
+def get_font(size):
+    # SysFont lookups are slow; create each size once
+    if size not in _fonts:
+        pygame.font.init()
+        _fonts[size] = pygame.font.SysFont(None, size)
+    return _fonts[size]
+
+def quit_pygame():
+    # cached fonts die with pygame.quit(); drop them so a later init starts clean
+    _fonts.clear()
+    pygame.quit()
+
+class GlyphCache:
+    """Renders each character once per font and composes strings from the cached glyphs."""
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.glyphs = {}
+
+    def glyph(self, ch):
+        g = self.glyphs.get(ch)
+        if g is None:
+            g = self.glyphs[ch] = self.font.render(ch, True, self.color)
+        return g
+
+    def size(self, text):
+        return sum(self.glyph(ch).get_width() for ch in text), self.font.get_height()
+
+    def blit(self, surface, text, pos):
+        x, y = pos
+        for ch in text:
+            g = self.glyph(ch)
+            surface.blit(g, (x, y))
+            x += g.get_width()
+
+    def blit_centered(self, surface, text, center):
+        w, h = self.size(text)
+        self.blit(surface, text, (center[0] - w // 2, center[1] - h // 2))
+
+class GridRenderer:
+    def __init__(self, gw, cellsize=CELL, title="Robot", headless=False):
+        self.gw = gw
+        self.cellsize = cellsize
+        self.headless = headless
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.init()
+        pygame.font.init()
+        self.rows, self.cols = gw.grid.shape
+        self.width = self.cols * (cellsize + MARGIN) + MARGIN
+        self.grid_height = self.rows * (cellsize + MARGIN) + MARGIN
+        self.height = self.grid_height + INFO_LINES * INFO_LINE + 10
+        if headless:
+            self.screen = pygame.Surface((self.width, self.height))
+        else:
+            self.screen = pygame.display.set_mode((self.width, self.height))
+            pygame.display.set_caption(title)
+        count_size = int(cellsize * COUNT_FONT_SCALE)
+        self.count_glyphs = GlyphCache(get_font(count_size), COLORS['text']) if count_size >= MIN_COUNT_FONT else None
+        self.info_glyphs = GlyphCache(get_font(20), COLORS['text'])
+        # dynamic state: remaining items per goal cell, visited cells, robot position
+        self.counts = dict(gw.goal_cells)
+        self.visited = set()
+        self.robot = None
+        self.background = self._render_background()
+        self.screen.blit(self.background, (0, 0))
+        self.dirty = [self.screen.get_rect()]
+
+    def cell_rect(self, pos):
+        r, c = pos
+        return pygame.Rect(c * (self.cellsize + MARGIN) + MARGIN, r * (self.cellsize + MARGIN) + MARGIN,
+                           self.cellsize, self.cellsize)
+
+    def _render_background(self):
+        # static layout: obstacles, empty cells and start; goal cells start out empty
+        bg = pygame.Surface((self.width, self.height))
+        bg.fill(COLORS['bg'])
+        for r in range(self.rows):
+            for c in range(self.cols):
+                if self.gw.grid[r, c] == 1:
+                    color = COLORS['obstacle']
+                elif (r, c) == self.gw.start:
+                    color = COLORS['start']
                 else:
-                    color = COLORS['empty']  # Empty goal cell
-            else:
-                color = COLORS['empty']
-            
-            pygame.draw.rect(surface, color, rect)
+                    color = COLORS['empty']
+                pygame.draw.rect(bg, color, self.cell_rect((r, c)))
+        for pos, n in self.counts.items():
+            self._draw_goal(bg, pos, n)
+        return bg
+
+    def _draw_goal(self, surface, pos, n):
+        rect = self.cell_rect(pos)
+        pygame.draw.rect(surface, COLORS['goal'] if n > 0 else COLORS['empty'], rect)
+        if n > 0 and self.count_glyphs is not None:
+            # clip to the cell so wide counts never spill into cells redrawn later
+            clip = surface.get_clip()
+            surface.set_clip(rect)
+            self.count_glyphs.blit_centered(surface, str(n), rect.center)
+            surface.set_clip(clip)
+
+    def _draw_cell(self, pos):
+        # restore the cell from the background, then layer the dynamic parts
+        rect = self.cell_rect(pos)
+        self.screen.blit(self.background, rect, rect)
+        if pos in self.counts:
+            self._draw_goal(self.screen, pos, self.counts[pos])
+        elif pos in self.visited and self.gw.grid[pos] == 0:
+            pygame.draw.circle(self.screen, COLORS['path'], rect.center, self.cellsize // 6)
+        if pos == self.robot:
+            pygame.draw.rect(self.screen, COLORS['robot'], rect.inflate(-(self.cellsize // 5), -(self.cellsize // 5)))
+        self.dirty.append(rect)
+
+    def update(self, pos, goal_counts=None, info_lines=()):
+        """
+        Move the robot to pos and apply goal_counts ({goal_pos: remaining});
+        only the affected cells and the info panel are redrawn.
+        """
+        changed = set()
+        if goal_counts:
+            for g, n in goal_counts.items():
+                if self.counts.get(g) != n:
+                    self.counts[g] = n
+                    changed.add(g)
+        if pos is not None:
+            if pos not in self.visited:
+                self.visited.add(pos)
+                changed.add(pos)
+            if pos != self.robot:
+                if self.robot is not None:
+                    changed.add(self.robot)
+                changed.add(pos)
+                self.robot = pos
+        for cell in changed:
+            self._draw_cell(cell)
+        panel = pygame.Rect(0, self.grid_height, self.width, self.height - self.grid_height)
+        self.screen.fill(COLORS['bg'], panel)
+        for i, line in enumerate(info_lines):
+            self.info_glyphs.blit(self.screen, line, (10, self.grid_height + 5 + i * INFO_LINE))
+        self.dirty.append(panel)
+
+    def present(self):
+        # push only the dirty rectangles to the display
+        if not self.headless:
+            pygame.display.update(self.dirty)
+        self.dirty = []
 
-            # Draw items count for goal cells with remaining items
-            if (r,c) in gw.goal_cells and gw.goal_cells[(r,c)] > 0:
-                surface.blit(text, text_rect)
+    def to_array(self):
+        """Current frame as a (height, width, 3) uint8 array."""
+        return pygame.surfarray.array3d(self.screen).transpose(1, 0, 2)
 
-def animate_path(gw, path, fps=2, title="Robot", step_delay=5.0, rewards=None, goal_history=None, goal_positions=None):
+class FrameWriter:
+    """
+    Collects frames from a GridRenderer:
+    - output='array': keeps NumPy arrays in self.frames
+    - output ending in '.gif': writes an animated GIF on close() (requires Pillow)
+    - any other output: directory for a frame_00000.png sequence
+    """
+    def __init__(self, output, fps=2):
+        self.output = output
+        self.fps = fps
+        self.frames = []
+        self.count = 0
+        self.is_gif = output != 'array' and str(output).lower().endswith('.gif')
+        if self.is_gif:
+            try:
+                from PIL import Image
+            except ImportError:
+                raise ImportError("GIF export requires Pillow (pip install pillow)")
+            self._image = Image
+        elif output != 'array':
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, renderer):
+        if self.output == 'array':
+            self.frames.append(renderer.to_array())
+        elif self.is_gif:
+            self.frames.append(self._image.fromarray(renderer.to_array()))
+        else:
+            pygame.image.save(renderer.screen, os.path.join(self.output, f"frame_{self.count:05d}.png"))
+        self.count += 1
+
+    def close(self):
+        if self.is_gif and self.frames:
+            self.frames[0].save(self.output, save_all=True, append_images=self.frames[1:],
+                                duration=int(1000 / max(self.fps, 1)), loop=0)
+            self.frames = []
+
+def animate_path(gw, path, fps=2, title="Robot", step_delay=5.0, rewards=None, goal_history=None, goal_positions=None,
+                 headless=False, output=None, cellsize=CELL):
     """
     rewards: optional list of reward values aligned with transitions (len = len(path)-1)
     goal_history: sequence of goal-count tuples per timestep (aligned with path)
     goal_positions: ordered goal locations matching entries in goal_history tuples
+    headless: render offscreen (SDL dummy driver) without frame pacing
+    output: None, 'array' (returns list of frames), a '.gif' path or a PNG directory
+    cellsize: pixels per cell (use a small value for 100x100+ grids)
+    path, rewards and goal_history may be any iterables (e.g. generators); they are consumed lazily.
     """
-    pygame.init()
-    pygame.font.init()
-    font = pygame.font.SysFont(None, 20)
-    rows, cols = gw.grid.shape
-    cellsize = CELL
-    width = cols * (cellsize + MARGIN) + MARGIN
-    height = rows * (cellsize + MARGIN) + MARGIN + 60
-    screen = pygame.display.set_mode((width, height))
-    pygame.display.set_caption(title)
+    renderer = GridRenderer(gw, cellsize=cellsize, title=title, headless=headless)
+    writer = FrameWriter(output, fps=fps) if output is not None else None
     clock = pygame.time.Clock()
-    running = True
-    step = 0
-    total_reward = 0
     has_goal_history = goal_history is not None and goal_positions is not None
-    if has_goal_history and len(goal_history) > 0:
-        initial_items = sum(goal_history[0])
-    else:
-        initial_items = sum(gw.goal_cells.values())
-    remaining_items = initial_items  # Track remaining items
-    items_collected = 0
-
-    while running:
-        clock.tick(fps)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-        screen.fill(COLORS['bg'])
-
-        if has_goal_history and len(goal_history) > 0:
-            state_idx = min(step, len(goal_history) - 1)
-            goals_state = goal_history[state_idx]
-            for idx, goal_pos in enumerate(goal_positions):
-                gw.goal_cells[goal_pos] = goals_state[idx]
-                gw.grid[goal_pos] = 2 if goals_state[idx] > 0 else 0
-
-        draw_grid(screen, gw, cellsize)
-
-        # Draw path marker for empty cells only
-        for i, p in enumerate(path[:step+1]):
-            r, c = p
-            if gw.grid[r, c] == 0 and (r, c) not in gw.goal_cells:
-                x = c * (cellsize + MARGIN) + MARGIN
-                y = r * (cellsize + MARGIN) + MARGIN
-                center = (x + cellsize//2, y + cellsize//2)
-                pygame.draw.circle(screen, COLORS['path'], center, cellsize//6)
-
-        # Draw robot at current position
-        if step < len(path):
-            r, c = path[step]
-            x = c * (cellsize + MARGIN) + MARGIN
-            y = r * (cellsize + MARGIN) + MARGIN
-            rect = pygame.Rect(x+4, y+4, cellsize-8, cellsize-8)
-            pygame.draw.rect(screen, COLORS['robot'], rect)
+    total_steps = len(path) - 1 if hasattr(path, '__len__') else None
+    reward_iter = iter(rewards) if rewards is not None else None
+    goal_iter = iter(goal_history) if has_goal_history else None
+    initial_items = None
+    goals_state = None
+    total_reward = 0
+    running = True
+
+    for step, pos in enumerate(path):
+        if not headless:
+            clock.tick(fps)
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+            if not running:
+                break
+
+        goal_counts = None
+        if goal_iter is not None:
+            goals_state = next(goal_iter, goals_state)
+            if goals_state is not None:
+                goal_counts = dict(zip(goal_positions, goals_state))
+        if goal_counts is None:
+            goal_counts = dict(gw.goal_cells)
+        remaining_items = sum(goal_counts.values())
+        if initial_items is None:
+            initial_items = remaining_items
 
         # Update statistics
         current_reward = 0
-        if rewards and step-1 >= 0 and step-1 < len(rewards):
-            current_reward = rewards[step-1]
+        if step > 0 and reward_iter is not None:
+            current_reward = next(reward_iter, 0)
             total_reward += current_reward
-            
-        # Calculate remaining items
-        if has_goal_history and len(goal_history) > 0:
-            remaining_items = sum(goal_history[min(step, len(goal_history) - 1)])
-        else:
-            remaining_items = sum(gw.goal_cells.values())
-        items_collected = initial_items - remaining_items
 
-        # Update display information
         info_lines = [
-            f"Step: {step}/{len(path)-1}",
+            f"Step: {step}/{total_steps if total_steps is not None else '?'}",
             f"Current Reward: {current_reward:+.1f}",
             f"Total Reward: {total_reward:+.1f}",
-            f"Items Collected: {items_collected}/{initial_items}",
+            f"Items Collected: {initial_items - remaining_items}/{initial_items}",
             f"Remaining Items: {remaining_items}"
         ]
+        renderer.update(tuple(pos), goal_counts, info_lines)
+        renderer.present()
+        if writer is not None:
+            writer.write(renderer)
 
-        # Draw info text
-        for i, line in enumerate(info_lines):
-            txt = font.render(line, True, COLORS['text'])
-            screen.blit(txt, (10, height-80 + i*18))
-
-        pygame.display.flip()
-        step += 1
+    # keep the goal-cell state of the gridworld in sync with the last frame
+    if goals_state is not None:
+        for idx, goal_pos in enumerate(goal_positions):
+            gw.goal_cells[goal_pos] = goals_state[idx]
+            gw.grid[goal_pos] = 2 if goals_state[idx] > 0 else 0
 
-        # Check if we've reached the end of path
-        if step > len(path):
-            time.sleep(step_delay)
-            running = False
-
-    pygame.quit()
+    if running and not headless:
+        time.sleep(step_delay)
+    quit_pygame()
+    if writer is not None:
+        writer.close()
+        if output == 'array':
+            return writer.frames